@@ -0,0 +1,54 @@
+"""
+Command log for SimCity Clone.
+
+Records the player commands applied to a Simulation, each with the tick and
+the job step within that tick it was applied at. Replaying a log from the
+same starting city and seed reproduces the session exactly, so real play
+sessions can be rerun headless to profile them or to check that an
+optimization didn't change the outcome.
+"""
+
+import json
+
+LOG_VERSION = 1
+
+
+class CommandLog:
+    """A recorded session: starting city, seed, and the commands applied."""
+
+    def __init__(self, seed, start):
+        self.seed = seed
+        self.start = start  # Save data of the city the session started from
+        self.commands = []  # [tick, step, command] in the order they were applied
+        self.end = None  # [tick, step] when recording stopped
+        self.final_hash = None  # Simulation.state_hash() when recording stopped
+
+    def record(self, tick, step, command):
+        self.commands.append([tick, step, list(command)])
+
+    def to_dict(self):
+        return {
+            'version': LOG_VERSION,
+            'seed': self.seed,
+            'start': self.start,
+            'commands': self.commands,
+            'end': self.end,
+            'final_hash': self.final_hash,
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        log = cls(data['seed'], data['start'])
+        log.commands = data.get('commands', [])
+        log.end = data.get('end')
+        log.final_hash = data.get('final_hash')
+        return log
+
+    def save(self, filepath):
+        with open(filepath, 'w') as f:
+            json.dump(self.to_dict(), f)
+
+    @classmethod
+    def load(cls, filepath):
+        with open(filepath, 'r') as f:
+            return cls.from_dict(json.load(f))
@@ -3,6 +3,14 @@ Crime system for SimCity Clone.
 Handles crime generation and police coverage.
 """
 
+from functools import lru_cache
+
+import numpy as np
+
+from engine.grid import CHUNK_SIZE, POLICE, type_table
+from engine.journal import CHANGE_CRIME, CHANGE_POPULATION, CHANGE_TYPE
+from engine.kernels import ChunkedField, chunk_blocks, falloff_kernel, fft_convolve
+
 # Police station coverage radius (in tiles)
 POLICE_RADIUS = 8
 
@@ -12,69 +20,276 @@ CRIME_RATES = {
     'commercial': 0.1,      # Some crime from commercial
     'residential': 0.05,    # Low base crime from high-density residential
 }
+CRIME_RATE_TABLE = type_table(CRIME_RATES)
+
+# Base crime below this is convolution round-off, not crime. The smallest real
+# contribution (residential, population 1, at the edge of the radius) is ~6e-4.
+CRIME_EPSILON = 1e-9
 
 
 class CrimeSystem:
-    """Manages crime levels across the city."""
+    """
+    Manages crime levels across the city.
+    
+    Base crime (every tile's crime source weighted by distance falloff) is
+    kept between ticks. Each tick only the tiles whose type or population
+    changed are stamped into it, and only the chunks those stamps touch are
+    rewritten, so the cost follows the churn rather than the map size. A
+    full recompute every FULL_RECOMPUTE_INTERVAL ticks discards any
+    accumulated round-off; ticks that changed most chunks recompute too,
+    which is cheaper than stamping them (and runs on the pool if given).
+    """
+    
+    # How far crime spreads from its source (in tiles)
+    CRIME_RADIUS = 6
+    
+    # Ticks between full recomputes of base crime
+    FULL_RECOMPUTE_INTERVAL = 100
+    
+    # Share of the allocated chunks with changes above which a full recompute
+    # (one FFT per block) is cheaper than stamping every changed chunk
+    FULL_RECOMPUTE_SHARE = 0.5
+    
+    # Changed sources in one chunk above which one FFT beats per-tile stamps
+    STAMP_LIMIT = 64
+    
+    def __init__(self, pool=None):
+        self.pool = pool  # StripPool for full recomputes, or None to run them here
+        self.police_coverage = None  # ChunkedField, built on the first update
+        self.police_stations = set()  # Stations already stamped into police_coverage
+        self.base_crime = None  # ChunkedField of unclipped falloff-weighted crime
+        self.crime_sources = None  # ChunkedField of each tile's source as last stamped
+        self.ticks_since_full = 0
+        self.last_drift = 0.0  # Largest correction made by the last full recompute
     
     def update(self, grid):
-        """Update crime levels for all tiles."""
-        # First, find all police stations and their coverage
-        police_coverage = self._calculate_police_coverage(grid)
+        """Update crime levels for the tiles affected by changes since the last tick."""
+        for _ in self.update_steps(grid):
+            pass
+    
+    def update_steps(self, grid):
+        """
+        Generator form of update() that yields after each chunk it stamps or
+        writes, so a scheduler can spread the work over several frames.
+        """
+        # Police coverage only changes when a station is built or removed
+        police_rects = self._update_police_coverage(grid)
+        
+        changes = grid.journal.consume('crime', CHANGE_TYPE | CHANGE_POPULATION)
+        self.ticks_since_full += 1
+        if (self.base_crime is None or changes.full
+                or self.ticks_since_full >= self.FULL_RECOMPUTE_INTERVAL
+                or len(changes.chunk_keys(CHUNK_SIZE)) > self.FULL_RECOMPUTE_SHARE * len(grid.chunks)):
+            targets = yield from self._recompute(grid)
+        else:
+            targets = set()
+            if changes:
+                for keys in self._stamp_changes(grid, changes):
+                    targets.update(keys)
+                    yield
+            for rect in police_rects:
+                targets.update(grid.chunk_keys_in(*rect))
+        for key in targets:
+            self._write_crime(grid, key)
+            yield
+    
+    def _recompute(self, grid):
+        """
+        Rebuild base crime and crime sources from scratch.
+        
+        Generator that yields after each block it convolves (once, after all
+        of them, with a pool) and returns the keys of the chunks whose crime
+        levels need rewriting.
+        """
+        old_base = self.base_crime
+        self.base_crime = ChunkedField(grid.width, grid.height)
+        self.crime_sources = ChunkedField(grid.width, grid.height)
+        self.ticks_since_full = 0
         
-        # Reset and recalculate crime for each tile
-        for x in range(grid.width):
-            for y in range(grid.height):
-                tile = grid.tiles[x][y]
-                
-                # Calculate base crime from nearby sources
-                base_crime = self._calculate_base_crime(grid, x, y)
-                
-                # Reduce crime based on police coverage
-                coverage = police_coverage.get((x, y), 0.0)
-                final_crime = base_crime * (1.0 - coverage * 0.8)  # Police reduce up to 80%
-                
-                tile.crime_level = max(0.0, min(1.0, final_crime))
-    
-    def _calculate_police_coverage(self, grid):
-        """Calculate police coverage for each tile."""
-        coverage = {}
+        # Crime can only land in allocated chunks or next to chunks that emit it
+        targets = set(grid.chunks)
+        for chunk in grid.iter_chunks():
+            sources = self._crime_sources(chunk.type_code, chunk.population)
+            if sources.any():
+                self.crime_sources.chunks[(chunk.cx, chunk.cy)] = sources
+                targets.update(grid.neighbor_chunk_keys(chunk))
         
-        # Find all police stations
-        for x in range(grid.width):
-            for y in range(grid.height):
-                if grid.tiles[x][y].type == 'police':
-                    # Add coverage in radius
-                    for dx in range(-POLICE_RADIUS, POLICE_RADIUS + 1):
-                        for dy in range(-POLICE_RADIUS, POLICE_RADIUS + 1):
-                            nx, ny = x + dx, y + dy
-                            if 0 <= nx < grid.width and 0 <= ny < grid.height:
-                                # Distance-based falloff
-                                dist = ((dx ** 2) + (dy ** 2)) ** 0.5
-                                if dist <= POLICE_RADIUS:
-                                    strength = 1.0 - (dist / POLICE_RADIUS)
-                                    current = coverage.get((nx, ny), 0.0)
-                                    coverage[(nx, ny)] = min(1.0, current + strength)
+        # Base crime is the source layer convolved with the distance falloff
+        radius = self.CRIME_RADIUS
+        kernel = falloff_kernel(radius)
+        blocks = self._source_blocks(grid, targets)
+        if self.pool is None:
+            results = ((block, fft_convolve(block[3], kernel)) for block in blocks)
+        else:
+            blocks = list(blocks)
+            results = zip(blocks, self.pool.map_windows(
+                fft_convolve, [(y0, sources) for _, y0, _, sources in blocks], radius, kernel))
+        for (x0, y0, keys, _), base_crime in results:
+            for key in keys:
+                cx0, cy0, cx1, cy1 = grid.chunk_bounds(key)
+                self.base_crime.chunks[key] = base_crime[cx0 - x0:cx1 - x0, cy0 - y0:cy1 - y0].copy()
+            yield
         
-        return coverage
+        if old_base is not None:
+            self.last_drift = 0.0
+            for key in set(old_base.chunks) | set(self.base_crime.chunks):
+                old = old_base.chunks.get(key)
+                new = self.base_crime.chunks.get(key)
+                diff = np.abs((0.0 if new is None else new) - (0.0 if old is None else old))
+                self.last_drift = max(self.last_drift, float(np.max(diff)))
+        return targets
     
-    def _calculate_base_crime(self, grid, x, y):
-        """Calculate base crime level at a position from nearby sources."""
-        total_crime = 0.0
+    def _source_blocks(self, grid, targets):
+        """Yield (x0, y0, keys, padded crime sources) for each block of targets that has any."""
+        radius = self.CRIME_RADIUS
+        for x0, y0, x1, y1, keys in chunk_blocks(grid, targets):
+            sources = self._crime_sources(
+                grid.window('type_code', x0 - radius, y0 - radius, x1 + radius, y1 + radius),
+                grid.window('population', x0 - radius, y0 - radius, x1 + radius, y1 + radius))
+            if sources.any():
+                yield x0, y0, keys, sources
+    
+    def _stamp_changes(self, grid, changes):
+        """
+        Stamp the source deltas of changed tiles into base crime.
+        
+        Yields, per stamped chunk, the keys of the chunks whose base crime moved.
+        """
+        # Source delta for every changed tile
+        xs, ys = changes.positions()
+        delta_xs, delta_ys, deltas = [], [], []
+        for key, lx, ly, index in grid.split_by_chunk(xs, ys):
+            chunk = grid.chunks.get(key)
+            if chunk is None:
+                new = np.zeros(len(index))
+            else:
+                new = self._crime_sources(chunk.type_code[lx, ly], chunk.population[lx, ly])
+            stored = self.crime_sources.chunk(key, create=new.any())
+            old = np.zeros(len(index)) if stored is None else stored[lx, ly]
+            moved = new != old
+            if not moved.any():
+                continue
+            stored[lx, ly] = new
+            delta_xs.append(xs[index][moved])
+            delta_ys.append(ys[index][moved])
+            deltas.append((new - old)[moved])
+        if not deltas:
+            return
+        delta_xs = np.concatenate(delta_xs)
+        delta_ys = np.concatenate(delta_ys)
+        deltas = np.concatenate(deltas)
+        
+        radius = self.CRIME_RADIUS
+        kernel = falloff_kernel(radius)
+        size = 2 * radius + 1
+        for key, lx, ly, index in grid.split_by_chunk(delta_xs, delta_ys):
+            x0, y0, x1, y1 = grid.chunk_bounds(key)
+            # Stamp area covers the chunk plus the falloff radius on every side
+            if len(index) > self.STAMP_LIMIT:
+                sources = np.zeros((x1 - x0, y1 - y0))
+                np.add.at(sources, (lx, ly), deltas[index])
+                stamps = fft_convolve(np.pad(sources, 2 * radius), kernel)
+            else:
+                stamps = np.zeros((x1 - x0 + 2 * radius, y1 - y0 + 2 * radius))
+                for x, y, delta in zip(lx.tolist(), ly.tolist(), deltas[index].tolist()):
+                    stamps[x:x + size, y:y + size] += delta * kernel
+            self.base_crime.add(x0 - radius, y0 - radius, stamps)
+            yield grid.chunk_keys_in(x0 - radius, y0 - radius, x1 + radius, y1 + radius)
+    
+    def _write_crime(self, grid, key):
+        """Write the crime levels of one chunk from base crime and police coverage."""
+        chunk = grid.chunks.get(key)
+        base_crime = self.base_crime.chunk(key)
+        if base_crime is None:
+            if chunk is not None:
+                grid.record_chunk_changes(CHANGE_CRIME, chunk, chunk.crime_level != 0.0)
+                chunk.crime_level[:] = 0.0
+            return
+        
+        # Base crime below epsilon is round-off, not crime
+        crime = np.where(base_crime < CRIME_EPSILON, 0.0, np.minimum(1.0, base_crime))
+        
+        # Reduce crime based on police coverage
+        coverage = self.police_coverage.chunk(key)
+        if coverage is not None:
+            coverage = np.minimum(1.0, coverage)
+            crime = crime * (1.0 - coverage * 0.8)  # Police reduce up to 80%
+        crime_levels = np.clip(crime, 0.0, 1.0)
+        
+        if chunk is None:
+            if not crime_levels.any():
+                return  # Leave crime-free grass unallocated
+            chunk = grid.ensure_chunk(*grid.chunk_bounds(key)[:2])
+        grid.record_chunk_changes(CHANGE_CRIME, chunk, chunk.crime_level != crime_levels)
+        chunk.crime_level[:] = crime_levels
+    
+    def _crime_sources(self, type_codes, populations):
+        """Return the crime each tile emits before distance falloff."""
+        return CRIME_RATE_TABLE[type_codes] * populations / 10
+    
+    def police_coverage_at(self, x, y):
+        """Return police coverage (0-1) at a tile."""
+        if self.police_coverage is None:
+            return 0.0
+        return min(1.0, self.police_coverage.get(x, y))
+    
+    def police_coverage_window(self, x0, y0, x1, y1):
+        """Return police coverage (0-1) for the rectangle [x0, x1) x [y0, y1)."""
+        if self.police_coverage is None:
+            return np.zeros((x1 - x0, y1 - y0))
+        return np.minimum(1.0, self.police_coverage.window(x0, y0, x1, y1))
+    
+    def _update_police_coverage(self, grid):
+        """
+        Bring the cached coverage field up to date with the police stations.
         
-        # Check tiles in a radius for crime sources
-        radius = 6
-        for dx in range(-radius, radius + 1):
-            for dy in range(-radius, radius + 1):
-                nx, ny = x + dx, y + dy
-                if 0 <= nx < grid.width and 0 <= ny < grid.height:
-                    neighbor = grid.tiles[nx][ny]
-                    crime_rate = CRIME_RATES.get(neighbor.type, 0.0)
-                    
-                    if crime_rate > 0 and neighbor.population > 0:
-                        # Distance-based falloff
-                        dist = max(1, ((dx ** 2) + (dy ** 2)) ** 0.5)
-                        contribution = (crime_rate * neighbor.population / 10) / dist
-                        total_crime += contribution
+        The field holds the plain sum of every station's stamp; readers cap it
+        at 1, which equals the per-station saturating sum. Nothing runs unless
+        a tile type changed since the last tick. Returns the rectangles whose
+        coverage changed.
+        """
+        changes = grid.journal.consume('crime.police', CHANGE_TYPE)
+        if self.police_coverage is None or changes.full:
+            # First tick or a new grid: stamp every station from scratch
+            self.police_coverage = ChunkedField(grid.width, grid.height)
+            self.police_stations = set()
+        elif not changes:
+            return []
         
-        return min(1.0, total_crime)
+        stations = grid.buildings.by_type[POLICE]
+        removed = self.police_stations - stations
+        added = stations - self.police_stations
+        self.police_stations = set(stations)
+        
+        stamp = police_stamp()
+        r = POLICE_RADIUS
+        if removed:
+            kept = np.array(sorted(self.police_stations - added), dtype=np.int64).reshape(-1, 2)
+        for x, y in sorted(removed):
+            # Re-stamp the removed station's square from the stations still
+            # overlapping it, rather than subtracting, so no round-off lingers
+            self.police_coverage.clear(x - r, y - r, x + r + 1, y + r + 1)
+            near = (np.abs(kept[:, 0] - x) <= 2 * r) & (np.abs(kept[:, 1] - y) <= 2 * r)
+            for sx, sy in kept[near].tolist():
+                lo_x, lo_y = max(sx, x) - r, max(sy, y) - r
+                hi_x, hi_y = min(sx, x) + r + 1, min(sy, y) + r + 1
+                self.police_coverage.add(lo_x, lo_y, stamp[lo_x - (sx - r):hi_x - (sx - r),
+                                                           lo_y - (sy - r):hi_y - (sy - r)])
+        for x, y in sorted(added):
+            self.police_coverage.add(x - r, y - r, stamp)
+        return [(x - r, y - r, x + r + 1, y + r + 1) for x, y in removed | added]
+
+
+@lru_cache(maxsize=None)
+def police_stamp():
+    """Return the (2r+1) x (2r+1) coverage one police station adds around itself."""
+    r = POLICE_RADIUS
+    stamp = np.zeros((2 * r + 1, 2 * r + 1))
+    for dx in range(-r, r + 1):
+        for dy in range(-r, r + 1):
+            # Distance-based falloff
+            dist = ((dx ** 2) + (dy ** 2)) ** 0.5
+            if dist <= r:
+                stamp[r + dx, r + dy] = 1.0 - (dist / r)
+    stamp.flags.writeable = False
+    return stamp
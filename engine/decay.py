@@ -4,6 +4,11 @@ Decay System for SimCity Clone v0.4.0
 Manages building decay from underfunded services and natural deterioration.
 """
 
+import numpy as np
+
+from engine.grid import CHUNK_SIZE, IS_BUILDING, IS_ZONE
+from engine.journal import CHANGE_HEALTH, CHANGE_POPULATION, CHANGE_TYPE
+
 
 class DecaySystem:
     """System for managing building health and decay mechanics."""
@@ -18,6 +23,9 @@ class DecaySystem:
     def __init__(self):
         self.police_funding = 1.0  # 0.0 to 1.0
         self.fire_funding = 1.0  # 0.0 to 1.0
+        # Chunk keys holding a building below full health that can still be
+        # repaired, so fully funded ticks only visit those chunks
+        self.damaged = set()
 
     def update(self, grid, economy=None):
         """
@@ -26,13 +34,41 @@ class DecaySystem:
         Args:
             grid: The game grid
             economy: The economy system (optional, for reading funding levels)
+        
+        Returns:
+            List of (x, y) positions of buildings that collapsed this tick
+        """
+        collapses = []
+        for chunk_collapses in self.update_steps(grid, economy):
+            collapses.extend(chunk_collapses)
+        return collapses
+
+    def update_steps(self, grid, economy=None):
+        """
+        Generator form of update() that yields the collapses of each chunk
+        it visits, so a scheduler can spread the work over several frames.
         """
         if economy:
             self._update_funding_from_economy(economy)
         
-        self._apply_decay(grid)
-        self._apply_repairs(grid)
-        self._check_collapsed_buildings(grid)
+        # Chunks whose health or type changed since the last tick (fires,
+        # bulldozing, loads, and the writes of the last tick)
+        changes = grid.journal.consume('decay', CHANGE_HEALTH | CHANGE_TYPE)
+        if changes.full:
+            self.damaged = set(grid.chunks)
+        elif changes:
+            self.damaged.update(changes.chunk_keys(CHUNK_SIZE))
+        
+        # Decay reaches every building, otherwise only damaged chunks need work
+        decay = self.police_funding < 1.0 or self.fire_funding < 1.0
+        keys = set(grid.chunks) if decay else self.damaged
+        
+        for key in sorted(keys):
+            chunk = grid.chunks.get(key)
+            if chunk is None:
+                self.damaged.discard(key)
+                continue
+            yield self._update_chunk(grid, chunk, decay)
 
     def _update_funding_from_economy(self, economy):
         """Read funding levels from economy system."""
@@ -40,64 +76,59 @@ class DecaySystem:
             self.police_funding = economy.service_funding.get('police', 1.0)
             self.fire_funding = economy.service_funding.get('fire', 1.0)
 
-    def _apply_decay(self, grid):
-        """Apply decay to buildings based on service funding."""
-        for x in range(grid.width):
-            for y in range(grid.height):
-                tile = grid.get_tile(x, y)
-                if tile is None or tile.is_burned:
-                    continue
-                
-                # Only buildings can decay
-                if tile.type not in ['residential', 'commercial', 'industrial', 
-                                     'power_plant', 'police', 'fire_station']:
-                    continue
-                
-                decay_rate = 0.0
-                
-                # Underfunded police increases decay in high-crime areas
-                if self.police_funding < 1.0 and tile.crime_level > 0.3:
-                    decay_rate += self.DECAY_RATE_BASE * (1.0 - self.police_funding) * tile.crime_level
-                
-                # Underfunded fire services increases decay risk
-                if self.fire_funding < 1.0:
-                    decay_rate += self.DECAY_RATE_BASE * (1.0 - self.fire_funding) * 0.5
-                
-                # Apply decay
-                if decay_rate > 0:
-                    tile.building_health = max(0.0, tile.building_health - decay_rate)
+    def _update_chunk(self, grid, chunk, decay):
+        """
+        Apply decay, repairs and collapses to one chunk in a single pass.
 
-    def _apply_repairs(self, grid):
-        """Naturally repair buildings when services are properly funded."""
-        # Only repair if both services are reasonably funded
-        if self.police_funding < 0.5 or self.fire_funding < 0.5:
-            return
+        Returns the positions of the buildings that collapsed.
+        """
+        health = chunk.building_health
+        changed = np.zeros(health.shape, dtype=bool)
         
-        repair_rate = self.REPAIR_RATE * min(self.police_funding, self.fire_funding)
+        # Apply decay to buildings based on service funding
+        if decay:
+            # Only buildings can decay
+            buildings = IS_BUILDING[chunk.type_code] & ~chunk.is_burned
+            
+            decay_rate = np.zeros(health.shape)
+            
+            # Underfunded police increases decay in high-crime areas
+            if self.police_funding < 1.0:
+                high_crime = chunk.crime_level > 0.3
+                decay_rate[high_crime] += self.DECAY_RATE_BASE * (1.0 - self.police_funding) * chunk.crime_level[high_crime]
+            
+            # Underfunded fire services increases decay risk
+            if self.fire_funding < 1.0:
+                decay_rate += self.DECAY_RATE_BASE * (1.0 - self.fire_funding) * 0.5
+            
+            decaying = buildings & (decay_rate > 0)
+            health[decaying] = np.maximum(0.0, health[decaying] - decay_rate[decaying])
+            changed |= decaying
         
-        for x in range(grid.width):
-            for y in range(grid.height):
-                tile = grid.get_tile(x, y)
-                if tile is None or tile.is_burned:
-                    continue
-                
-                # Only repair damaged buildings
-                if tile.building_health < 1.0 and tile.building_health > 0:
-                    tile.building_health = min(1.0, tile.building_health + repair_rate)
-
-    def _check_collapsed_buildings(self, grid):
-        """Check for buildings that have collapsed due to neglect."""
-        for x in range(grid.width):
-            for y in range(grid.height):
-                tile = grid.get_tile(x, y)
-                if tile is None:
-                    continue
-                
-                # Buildings with 0 health collapse into rubble
-                if tile.building_health <= 0 and not tile.is_burned:
-                    if tile.type in ['residential', 'commercial', 'industrial']:
-                        tile.is_burned = True  # Reuse burned state for collapsed
-                        tile.population = 0
+        # Naturally repair damaged buildings, only if both services are reasonably funded
+        damaged = (health < 1.0) & (health > 0) & ~chunk.is_burned
+        if self.police_funding >= 0.5 and self.fire_funding >= 0.5:
+            repair_rate = self.REPAIR_RATE * min(self.police_funding, self.fire_funding)
+            health[damaged] = np.minimum(1.0, health[damaged] + repair_rate)
+            changed |= damaged
+            damaged &= health < 1.0
+        grid.record_chunk_changes(CHANGE_HEALTH, chunk, changed)
+        
+        key = (chunk.cx, chunk.cy)
+        if damaged.any():
+            self.damaged.add(key)
+        else:
+            self.damaged.discard(key)
+        
+        # Buildings with 0 health collapse into rubble
+        collapsed = (health <= 0) & ~chunk.is_burned & IS_ZONE[chunk.type_code]
+        if not collapsed.any():
+            return []
+        chunk.is_burned[collapsed] = True  # Reuse burned state for collapsed
+        chunk.population[collapsed] = 0
+        grid.record_chunk_changes(CHANGE_HEALTH | CHANGE_POPULATION, chunk, collapsed)
+        lx, ly = np.nonzero(collapsed)
+        return list(zip((lx + chunk.x0).tolist(), (ly + chunk.y0).tolist()))
 
     def get_building_status(self, tile):
         """
@@ -3,6 +3,8 @@ Economy system for SimCity Clone.
 Handles money, zone placement costs, and tax collection.
 """
 
+from engine.grid import POLICE, FIRE_STATION, SERVICE_TYPES, type_table
+
 # Starting money for new games
 STARTING_MONEY = 20000
 
@@ -25,6 +27,7 @@ UPKEEP_COSTS = {
     'power_plant': 200,
     'fire_station': 150,  # v0.4.0
 }
+UPKEEP_TABLE = type_table(UPKEEP_COSTS, dtype=int)
 
 # Base tax income per population per simulation tick
 BASE_TAX_RATES = {
@@ -32,6 +35,7 @@ BASE_TAX_RATES = {
     'commercial': 2.0,    # Business tax
     'industrial': 1.5,    # Industrial tax
 }
+TAX_RATE_TABLE = type_table(BASE_TAX_RATES)
 
 
 class EconomySystem:
@@ -71,17 +75,12 @@ class EconomySystem:
         Collect taxes from all powered zones based on their population.
         Returns the total income collected this tick.
         """
-        income = 0
         tax_multiplier = self.tax_rate / 7.0  # 7% is baseline
         
-        for x in range(grid.width):
-            for y in range(grid.height):
-                tile = grid.tiles[x][y]
-                
-                # Only powered tiles generate tax income
-                if tile.is_powered and tile.population > 0:
-                    rate = BASE_TAX_RATES.get(tile.type, 0)
-                    income += tile.population * rate * tax_multiplier
+        # Only powered tiles generate tax income; the grid keeps their population per type
+        stats = grid.stats
+        stats.refresh()
+        income = float((stats.powered_populations * TAX_RATE_TABLE).sum() * tax_multiplier)
         
         # Round to avoid floating point accumulation issues
         income = round(income)
@@ -92,20 +91,19 @@ class EconomySystem:
         """Deduct upkeep costs for service buildings. Returns total upkeep."""
         upkeep = 0
         
-        for x in range(grid.width):
-            for y in range(grid.height):
-                tile = grid.tiles[x][y]
-                base_cost = UPKEEP_COSTS.get(tile.type, 0)
-                
-                # v0.4.0: Scale upkeep by funding level
-                if tile.type == 'police':
-                    cost = base_cost * self.service_funding.get('police', 1.0)
-                elif tile.type == 'fire_station':
-                    cost = base_cost * self.service_funding.get('fire', 1.0)
-                else:
-                    cost = base_cost
-                
-                upkeep += cost
+        # Service buildings come from the grid's registry, no map scan needed
+        for code in SERVICE_TYPES:
+            base_cost = int(UPKEEP_TABLE[code])
+            
+            # v0.4.0: Scale upkeep by funding level
+            if code == POLICE:
+                cost = base_cost * self.service_funding.get('police', 1.0)
+            elif code == FIRE_STATION:
+                cost = base_cost * self.service_funding.get('fire', 1.0)
+            else:
+                cost = base_cost
+            
+            upkeep += cost * grid.buildings.count(code)
         
         # Upkeep is deducted per tick (scaled down since it runs frequently)
         upkeep_per_tick = int(upkeep) // 60  # Spread monthly cost over ~60 ticks
@@ -118,7 +116,7 @@ class EconomySystem:
         return {
             'money': self.money,
             'tax_rate': self.tax_rate,
-            'service_funding': self.service_funding,  # v0.4.0
+            'service_funding': dict(self.service_funding),  # v0.4.0
         }
     
     def from_dict(self, data):
@@ -126,4 +124,4 @@ class EconomySystem:
         self.money = data.get('money', STARTING_MONEY)
         self.tax_rate = data.get('tax_rate', 7)
         # v0.4.0: Restore service funding
-        self.service_funding = data.get('service_funding', {'police': 1.0, 'fire': 1.0})
+        self.service_funding = dict(data.get('service_funding', {'police': 1.0, 'fire': 1.0}))
@@ -4,7 +4,13 @@ Fire System for SimCity Clone v0.4.0
 Manages fire ignition, spread, damage, and extinguishing mechanics.
 """
 
-import random
+from functools import lru_cache
+
+import numpy as np
+
+from engine.grid import CHUNK_SIZE, FIRE_STATION, type_table
+from engine.journal import CHANGE_CRIME, CHANGE_FIRE, CHANGE_HEALTH, CHANGE_TYPE
+from engine.kernels import ChunkedField
 
 
 class FireSystem:
@@ -38,97 +44,180 @@ class FireSystem:
         'police': 0.5,
         'fire_station': 0.3,  # Fire stations are more fire-resistant
     }
+    FLAMMABILITY_TABLE = type_table(FLAMMABILITY)
 
-    def __init__(self):
+    def __init__(self, rng=None):
+        self.rng = rng if rng is not None else np.random.default_rng()
         self.fire_stations = []  # List of (x, y) positions
-        self.active_fires = []  # List of tiles currently on fire
-        self.fire_ticks = {}  # Track how long each tile has been on fire: {(x,y): ticks}
+        self.grid = None  # Grid of the last update, for active_fires
+        # Station coverage: radius + 1 - Manhattan distance to the nearest
+        # station, so any value > 0 is covered. Rebuilt when stations change.
+        self.coverage = None
+        # The burning tiles and how long each has been on fire: {(x,y): ticks}.
+        # fire_ticks and active_fires are views of it.
+        self.burning = {}
+        # Ignition candidates: (cx, cy) -> (per-tile chance array, its sum),
+        # for chunks with any chance, plus the running sum over all chunks
+        self.ignition_rates = {}
+        self.total_ignition_rate = 0.0
+        # Ignition chance by tile type, before the crime bonus
+        self.ignition_chances = type_table({
+            'industrial': self.IGNITION_CHANCE_INDUSTRIAL,  # Industrial zones can catch fire
+            'power_plant': self.IGNITION_CHANCE_POWER_PLANT,  # Power plants can catch fire
+        })
+
+    @property
+    def fire_ticks(self):
+        """How long each burning tile has been on fire: {(x,y): ticks}."""
+        return self.burning
+
+    @property
+    def active_fires(self):
+        """Tiles currently on fire, in x-major order."""
+        if self.grid is None:
+            return []
+        return [self.grid.get_tile(x, y) for x, y in sorted(self.burning)]
 
     def update(self, grid):
         """Main update loop for fire system. Call once per game tick."""
-        self._update_fire_stations(grid)
+        self.grid = grid
+        self._sync_burning(grid)
+        self.update_coverage(grid)
         self._try_ignite_fires(grid)
-        self._spread_fires(grid)
-        self._apply_fire_damage(grid)
-        self._try_extinguish_fires(grid)
-        self._update_active_fires(grid)
-
-    def _update_fire_stations(self, grid):
-        """Scan grid for fire station positions."""
-        self.fire_stations = []
-        for x in range(grid.width):
-            for y in range(grid.height):
-                tile = grid.get_tile(x, y)
-                if tile and tile.type == 'fire_station':
-                    self.fire_stations.append((x, y))
+        if self.burning:
+            self._spread_fires(grid)
+            self._burn(grid)
+
+    def _sync_burning(self, grid):
+        """Pick up fires started or put out by anything other than this system (loads, bulldozing)."""
+        changes = grid.journal.consume('fire', CHANGE_FIRE)
+        if changes.full:
+            positions = grid.find(lambda c: c.is_on_fire)
+            self.burning = {pos: self.burning.get(pos, 0) for pos in positions}
+        elif changes:
+            xs, ys = changes.positions()
+            for pos in zip(xs.tolist(), ys.tolist()):
+                if grid.get_tile(*pos).is_on_fire:
+                    self.burning.setdefault(pos, 0)
+                else:
+                    self.burning.pop(pos, None)
+
+    def update_coverage(self, grid):
+        """Rebuild the coverage layer if the fire stations changed since the last call."""
+        # Stations come from the grid's building registry
+        stations = grid.buildings.positions(FIRE_STATION)
+        if (self.coverage is not None and stations == self.fire_stations and
+                (self.coverage.width, self.coverage.height) == (grid.width, grid.height)):
+            return
+        self.fire_stations = stations
+        # Build the new layer aside, so readers on another thread never see it half done
+        coverage = ChunkedField(grid.width, grid.height)
+        stamp = coverage_stamp(self.FIRE_STATION_RADIUS)
+        r = self.FIRE_STATION_RADIUS
+        for x, y in stations:
+            coverage.maximum(x - r, y - r, stamp)
+        self.coverage = coverage
 
     def _try_ignite_fires(self, grid):
-        """Attempt to start new fires based on tile types and conditions."""
-        for x in range(grid.width):
-            for y in range(grid.height):
-                tile = grid.get_tile(x, y)
-                if tile is None or tile.is_on_fire or tile.is_burned:
-                    continue
-
-                ignition_chance = 0.0
-
-                # Industrial zones can catch fire
-                if tile.type == 'industrial':
-                    ignition_chance += self.IGNITION_CHANCE_INDUSTRIAL
-
-                # Power plants can catch fire
-                elif tile.type == 'power_plant':
-                    ignition_chance += self.IGNITION_CHANCE_POWER_PLANT
-
-                # Crime increases fire risk (arson)
-                ignition_chance += tile.crime_level * self.IGNITION_CHANCE_CRIME_BONUS
-
-                # Roll for ignition
-                if ignition_chance > 0 and random.random() < ignition_chance:
-                    self._start_fire(tile)
+        """
+        Attempt to start new fires based on tile types and conditions.
+
+        Rather than rolling every candidate tile, draw the number of fires
+        this tick from a Poisson distribution with the summed chance, then
+        pick that many tiles weighted by their chance. With chances around
+        1e-4 this matches a roll per tile to within the square of the chance,
+        and a quiet tick costs one draw.
+        """
+        self._update_ignition_rates(grid)
+        if self.total_ignition_rate <= 0:
+            return
+        count = self.rng.poisson(self.total_ignition_rate)
+        if not count:
+            return
+
+        keys = sorted(self.ignition_rates)
+        totals = np.array([self.ignition_rates[key][1] for key in keys])
+        self.total_ignition_rate = float(totals.sum())  # Drop accumulated round-off
+        for index in self.rng.choice(len(keys), size=count, p=totals / totals.sum()).tolist():
+            rates, total = self.ignition_rates[keys[index]]
+            lx, ly = np.unravel_index(self.rng.choice(rates.size, p=rates.ravel() / total), rates.shape)
+            x, y = grid.chunk_bounds(keys[index])[:2]
+            if (x + lx, y + ly) not in self.burning:
+                self._start_fire(grid.get_tile(int(x + lx), int(y + ly)))
+
+    def _update_ignition_rates(self, grid):
+        """Recompute the ignition chances of chunks whose type, crime or fire state changed."""
+        changes = grid.journal.consume('fire.ignition', CHANGE_TYPE | CHANGE_CRIME | CHANGE_FIRE | CHANGE_HEALTH)
+        if changes.full:
+            self.ignition_rates = {}
+            self.total_ignition_rate = 0.0
+            keys = list(grid.chunks)
+        elif changes:
+            keys = changes.chunk_keys(CHUNK_SIZE)
+        else:
+            return
+
+        for key in keys:
+            old = self.ignition_rates.pop(key, None)
+            if old is not None:
+                self.total_ignition_rate -= old[1]
+            chunk = grid.chunks.get(key)
+            if chunk is None:
+                continue
+            # Crime increases fire risk (arson)
+            rates = (self.ignition_chances[chunk.type_code] +
+                     chunk.crime_level * self.IGNITION_CHANCE_CRIME_BONUS)
+            rates[chunk.is_on_fire | chunk.is_burned] = 0.0
+            total = float(rates.sum())
+            if total > 0:
+                self.ignition_rates[key] = (rates, total)
+                self.total_ignition_rate += total
 
     def _start_fire(self, tile):
         """Ignite a tile."""
         tile.is_on_fire = True
         tile.fire_intensity = 0.3  # Starting intensity
-        self.fire_ticks[(tile.x, tile.y)] = 0
+        self.burning[(tile.x, tile.y)] = 0
 
     def _spread_fires(self, grid):
         """Spread fire from burning tiles to adjacent tiles."""
-        new_fires = []
+        targets, chances = [], []
+
+        # x-major order, so the random draws happen in a stable order
+        for x, y in sorted(self.burning):
+            tile = grid.get_tile(x, y)
 
-        for x in range(grid.width):
-            for y in range(grid.height):
-                tile = grid.get_tile(x, y)
-                if tile is None or not tile.is_on_fire:
+            # Check each neighbor
+            for dx, dy in [(-1, 0), (1, 0), (0, -1), (0, 1)]:
+                neighbor = grid.get_tile(x + dx, y + dy)
+                if neighbor is None:
+                    continue
+                if neighbor.is_on_fire or neighbor.is_burned:
                     continue
 
-                # Check each neighbor
-                for dx, dy in [(-1, 0), (1, 0), (0, -1), (0, 1)]:
-                    neighbor = grid.get_tile(x + dx, y + dy)
-                    if neighbor is None:
-                        continue
-                    if neighbor.is_on_fire or neighbor.is_burned:
-                        continue
+                # Calculate spread chance
+                spread_chance = self._calculate_spread_chance(tile, neighbor)
 
-                    # Calculate spread chance
-                    spread_chance = self._calculate_spread_chance(tile, neighbor)
+                # Reduce spread in fire station coverage
+                if self._is_in_coverage(neighbor.x, neighbor.y):
+                    spread_chance *= 0.5
 
-                    # Reduce spread in fire station coverage
-                    if self._is_in_coverage(neighbor.x, neighbor.y):
-                        spread_chance *= 0.5
+                targets.append(neighbor)
+                chances.append(spread_chance)
+        if not targets:
+            return
 
-                    if random.random() < spread_chance:
-                        new_fires.append(neighbor)
+        # New fires only start after every roll, so all rolls can be drawn at once
+        rolls = self.rng.random(len(targets)).tolist()
 
         # Ignite new fires
-        for tile in new_fires:
-            if not tile.is_on_fire:  # Double-check to avoid duplicates
+        for tile, roll, chance in zip(targets, rolls, chances):
+            if roll < chance and not tile.is_on_fire:  # Double-check to avoid duplicates
                 self._start_fire(tile)
 
     def _calculate_spread_chance(self, source, target):
         """Calculate probability of fire spreading from source to target."""
-        flammability = self.FLAMMABILITY.get(target.type, 0.0)
+        flammability = float(self.FLAMMABILITY_TABLE[target.type_code])
         if flammability == 0:
             return 0.0
 
@@ -137,91 +226,67 @@ class FireSystem:
 
         return base_chance + intensity_bonus
 
-    def _apply_fire_damage(self, grid):
-        """Apply damage to burning tiles and grow fire intensity."""
-        for x in range(grid.width):
-            for y in range(grid.height):
-                tile = grid.get_tile(x, y)
-                if tile is None or not tile.is_on_fire:
-                    continue
-
-                # Increase fire intensity
-                tile.fire_intensity = min(1.0, tile.fire_intensity + self.INTENSITY_GROWTH)
-
-                # Apply damage to building health
-                tile.building_health -= self.DAMAGE_PER_TICK * tile.fire_intensity
-
-                # If building is destroyed, mark as burned rubble
-                if tile.building_health <= 0:
-                    tile.building_health = 0
-                    tile.is_on_fire = False
-                    tile.fire_intensity = 0.0
-                    tile.is_burned = True
-                    tile.population = 0
-                    # Remove from fire tracking
-                    self.fire_ticks.pop((x, y), None)
-
-    def _try_extinguish_fires(self, grid):
-        """Attempt to extinguish fires, especially in fire station coverage."""
-        tiles_to_extinguish = []
-
-        for x in range(grid.width):
-            for y in range(grid.height):
-                tile = grid.get_tile(x, y)
-                if tile is None or not tile.is_on_fire:
-                    continue
-
-                # Increment fire tick counter
-                key = (x, y)
-                self.fire_ticks[key] = self.fire_ticks.get(key, 0) + 1
-                ticks = self.fire_ticks[key]
-
-                # Check if fire should be extinguished
-                # Only fires within fire station coverage can be extinguished
-                # Fires outside coverage burn until the building is destroyed
-                if self._is_in_coverage(x, y):
-                    if ticks >= self.EXTINGUISH_TICKS_COVERED:
-                        tiles_to_extinguish.append(tile)
-
-        # Extinguish fires
-        for tile in tiles_to_extinguish:
-            self._extinguish_fire(tile)
+    def _burn(self, grid):
+        """
+        Grow and damage every burning tile, then count its ticks and put it
+        out if a fire station covers it.
+        """
+        for x, y in sorted(self.burning):
+            tile = grid.get_tile(x, y)
+
+            # Increase fire intensity
+            tile.fire_intensity = min(1.0, tile.fire_intensity + self.INTENSITY_GROWTH)
+
+            # Apply damage to building health
+            tile.building_health -= self.DAMAGE_PER_TICK * tile.fire_intensity
+
+            # If building is destroyed, mark as burned rubble
+            if tile.building_health <= 0:
+                tile.building_health = 0
+                tile.is_on_fire = False
+                tile.fire_intensity = 0.0
+                tile.is_burned = True
+                tile.population = 0
+                # Remove from fire tracking
+                del self.burning[(x, y)]
+                continue
+
+            # Only fires within fire station coverage can be extinguished
+            # Fires outside coverage burn until the building is destroyed
+            self.burning[(x, y)] += 1
+            if self._is_in_coverage(x, y):
+                if self.burning[(x, y)] >= self.EXTINGUISH_TICKS_COVERED:
+                    self._extinguish_fire(tile)
 
     def _extinguish_fire(self, tile):
         """Put out a fire on a tile."""
         tile.is_on_fire = False
         tile.fire_intensity = 0.0
-        self.fire_ticks.pop((tile.x, tile.y), None)
+        self.burning.pop((tile.x, tile.y), None)
 
     def _is_in_coverage(self, x, y):
         """Check if a position is within fire station coverage."""
-        for sx, sy in self.fire_stations:
-            distance = abs(x - sx) + abs(y - sy)  # Manhattan distance
-            if distance <= self.FIRE_STATION_RADIUS:
-                return True
-        return False
-
-    def _update_active_fires(self, grid):
-        """Update the list of tiles currently on fire."""
-        self.active_fires = []
-        for x in range(grid.width):
-            for y in range(grid.height):
-                tile = grid.get_tile(x, y)
-                if tile and tile.is_on_fire:
-                    self.active_fires.append(tile)
+        return self.coverage.get(x, y) > 0
 
     def get_fire_count(self):
         """Return the number of tiles currently on fire."""
-        return len(self.active_fires)
+        return len(self.burning)
 
     def get_coverage_tiles(self, grid):
         """Return set of (x, y) positions covered by fire stations."""
+        self.update_coverage(grid)
         covered = set()
-        for sx, sy in self.fire_stations:
-            for dx in range(-self.FIRE_STATION_RADIUS, self.FIRE_STATION_RADIUS + 1):
-                for dy in range(-self.FIRE_STATION_RADIUS, self.FIRE_STATION_RADIUS + 1):
-                    if abs(dx) + abs(dy) <= self.FIRE_STATION_RADIUS:
-                        x, y = sx + dx, sy + dy
-                        if 0 <= x < grid.width and 0 <= y < grid.height:
-                            covered.add((x, y))
+        for (cx, cy), layer in self.coverage.chunks.items():
+            lx, ly = np.nonzero(layer > 0)
+            x0, y0 = grid.chunk_bounds((cx, cy))[:2]
+            covered.update(zip((lx + x0).tolist(), (ly + y0).tolist()))
         return covered
+
+
+@lru_cache(maxsize=None)
+def coverage_stamp(radius):
+    """Return the (2r+1) x (2r+1) diamond of radius + 1 - Manhattan distance, clipped at 0."""
+    offsets = np.abs(np.arange(-radius, radius + 1))
+    stamp = np.maximum(0, radius + 1 - (offsets[:, None] + offsets[None, :])).astype(float)
+    stamp.flags.writeable = False
+    return stamp
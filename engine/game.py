@@ -2,15 +2,26 @@ import pygame
 import sys
 import json
 import os
-from engine.grid import Grid
+import time
+from collections import deque
+from contextlib import nullcontext
 from engine.renderer import Renderer
-from engine.systems import PowerSystem, GrowthSystem, DemandSystem
-from engine.economy import EconomySystem
-from engine.crime import CrimeSystem
-from engine.land_value import LandValueSystem
-from engine.fire import FireSystem
-from engine.decay import DecaySystem
 from engine.notifications import NotificationSystem
+from engine.simulation import Simulation
+from engine.worker import SimulationWorker
+
+# Simulation timing
+TICK_SECONDS = 1.0  # Length of one simulation tick at 1x speed
+SIM_BUDGET_MS = 4.0  # Time per frame for the sliced work of the current tick
+FAST_BUDGET_MS = 40.0  # Time per frame for whole ticks when fast-forwarding
+TPS_WINDOW = 2.0  # Seconds the HUD's ticks per second is averaged over
+SPEEDS = [  # (label, ticks per TICK_SECONDS); None runs as many ticks as fit
+    ('Paused', 0),
+    ('1x', 1),
+    ('3x', 3),
+    ('10x', 10),
+    ('Max', None),
+]
 
 # Toolbar button configuration
 TOOLBAR_HEIGHT = 60
@@ -31,7 +42,8 @@ TOOLS = [
 ]
 
 class Game:
-    def __init__(self):
+    def __init__(self, map_width=100, map_height=100, seed=None, threaded=False, processes=None,
+                 record=None):
         pygame.init()
         self.screen_width = 1200
         self.screen_height = 800
@@ -41,19 +53,22 @@ class Game:
         self.clock = pygame.time.Clock()
         self.running = True
         
-        self.grid = Grid(100, 100) # 100x100 map
-        self.renderer = Renderer(self.screen, self.grid)
+        # The city and its systems; the game adds a window, input and drawing
+        self.simulation = Simulation(map_width, map_height, seed, processes)
+        self.renderer = Renderer(self.screen, self.simulation.grid)
+        
+        # Ticks are due on a fixed timestep: each frame adds its real
+        # duration times the speed to the accumulator, and every TICK_SECONDS
+        # in it is one tick. A tick's systems run spread over the following
+        # frames, within SIM_BUDGET_MS per frame
+        self.speed = 1  # Index into SPEEDS
+        self.tick_accumulator = 0.0
+        self.frame_seconds = 1.0 / 60
+        self.scheduler.budget_ms = SIM_BUDGET_MS
         
-        self.power_system = PowerSystem()
-        self.growth_system = GrowthSystem()
-        self.demand_system = DemandSystem()
-        self.crime_system = CrimeSystem()
-        self.land_value_system = LandValueSystem()
-        self.fire_system = FireSystem()  # v0.4.0
-        self.decay_system = DecaySystem()  # v0.4.0
-        self.economy = EconomySystem()
-        self.tick_timer = 0
-        self.last_income = 0  # Track income for display
+        # Achieved ticks per second, measured over the last TPS_WINDOW seconds
+        self.tps = 0.0
+        self.tps_samples = deque()  # (time, tick) once per frame
         
         # v0.4.0: Toast notification system
         self.notifications = NotificationSystem(self.screen_width, self.screen_height)
@@ -64,7 +79,7 @@ class Game:
         
         # v0.3.0: Data overlays and budget
         # v0.4.0: Added 'fire' overlay
-        self.current_overlay = None  # None, 'crime', 'land_value', 'power', 'fire'
+        self.current_overlay = None  # None, 'crime', 'land_value', 'power', 'fire', 'road_access'
         self.show_budget = False
         self.budget_selection = 0  # 0=tax, 1=police funding, 2=fire funding
         
@@ -84,6 +99,19 @@ class Game:
         
         self.font = pygame.font.SysFont(None, 20)
         self.font_large = pygame.font.SysFont(None, 28)
+        
+        # With record, the session's commands are logged to that file on exit
+        # for replay with simulate.py --replay
+        self.record_path = record
+        if record:
+            self.simulation.start_recording()
+        
+        # With threaded, commands and ticks run on a worker thread and
+        # drawing reads the worker's snapshot of the grid
+        self.worker = None
+        if threaded:
+            self.worker = SimulationWorker(self.simulation)
+            self.worker.start()
 
     def _create_toolbar_buttons(self):
         toolbar_y = self.screen_height - TOOLBAR_HEIGHT + (TOOLBAR_HEIGHT - BUTTON_HEIGHT) // 2
@@ -139,6 +167,15 @@ class Game:
                     self.current_overlay = 'power' if self.current_overlay != 'power' else None
                 elif event.key == pygame.K_f:  # v0.4.0: Fire overlay
                     self.current_overlay = 'fire' if self.current_overlay != 'fire' else None
+                elif event.key == pygame.K_r:
+                    self.current_overlay = 'road_access' if self.current_overlay != 'road_access' else None
+                # Simulation speed
+                elif event.key == pygame.K_SPACE:
+                    self.set_speed(1 if self.speed == 0 else 0)
+                elif event.key in (pygame.K_MINUS, pygame.K_KP_MINUS):
+                    self.set_speed(self.speed - 1)
+                elif event.key in (pygame.K_EQUALS, pygame.K_PLUS, pygame.K_KP_PLUS):
+                    self.set_speed(self.speed + 1)
                 elif event.key == pygame.K_ESCAPE:
                     self.current_overlay = None
                     self.show_budget = False
@@ -223,40 +260,24 @@ class Game:
         if my >= self.screen_height - TOOLBAR_HEIGHT:
             return
         wx, wy = self.renderer.screen_to_world(mx, my)
-        
-        # Check if we can afford this
-        if not self.economy.can_afford(self.current_tool):
-            return  # Can't afford, do nothing
-        
-        if self.current_tool == 'power_line':
-            if self.economy.deduct_cost(self.current_tool):
-                self.grid.toggle_power_line(wx, wy)
-        else:
-            if self.economy.deduct_cost(self.current_tool):
-                self.grid.set_tile_type(wx, wy, self.current_tool)
+        self.submit(('tile', self.current_tool, wx, wy))
 
     def place_drag_zone(self):
         """Place tiles based on drag from start to end."""
         if not self.drag_start or not self.drag_end:
             return
-        
-        x1, y1 = self.drag_start
-        x2, y2 = self.drag_end
-        
-        # Normalize coordinates (ensure min <= max)
-        min_x, max_x = min(x1, x2), max(x1, x2)
-        min_y, max_y = min(y1, y2), max(y1, y2)
-        
-        if self.current_tool == 'road':
-            # Place roads along the perimeter only
-            self._place_perimeter_with_cost(min_x, min_y, max_x, max_y, 'road')
+        self.submit(('zone', self.current_tool) + self.get_drag_rect())
+
+    def submit(self, command):
+        """Apply a player command now, or queue it for the simulation thread."""
+        if self.worker:
+            self.worker.submit(command)
         else:
-            # Fill the entire rectangular area for RCI zones
-            for x in range(min_x, max_x + 1):
-                for y in range(min_y, max_y + 1):
-                    if self.economy.can_afford(self.current_tool):
-                        if self.economy.deduct_cost(self.current_tool):
-                            self.grid.set_tile_type(x, y, self.current_tool)
+            self.apply_command(command)
+
+    def apply_command(self, command):
+        """Apply a player command to the city now."""
+        self.simulation.apply_command(command)
 
     def _place_perimeter(self, min_x, min_y, max_x, max_y, tile_type):
         """Place tiles along the perimeter of a rectangle (no cost check)."""
@@ -273,29 +294,6 @@ class Game:
         for y in range(min_y + 1, max_y):
             self.grid.set_tile_type(max_x, y, tile_type)
     
-    def _place_perimeter_with_cost(self, min_x, min_y, max_x, max_y, tile_type):
-        """Place tiles along the perimeter with cost deduction."""
-        positions = []
-        # Top edge
-        for x in range(min_x, max_x + 1):
-            positions.append((x, min_y))
-        # Bottom edge (skip if same as top)
-        if max_y != min_y:
-            for x in range(min_x, max_x + 1):
-                positions.append((x, max_y))
-        # Left edge (excluding corners)
-        for y in range(min_y + 1, max_y):
-            positions.append((min_x, y))
-        # Right edge (excluding corners, skip if same as left)
-        if max_x != min_x:
-            for y in range(min_y + 1, max_y):
-                positions.append((max_x, y))
-        
-        for x, y in positions:
-            if self.economy.can_afford(tile_type):
-                if self.economy.deduct_cost(tile_type):
-                    self.grid.set_tile_type(x, y, tile_type)
-
     def get_drag_rect(self):
         """Get the current drag rectangle in world coordinates, or None if not dragging."""
         if not self.drag_start or not self.drag_end:
@@ -309,20 +307,58 @@ class Game:
         
         return (min_x, min_y, max_x, max_y)
 
+    def set_speed(self, index):
+        """Select one of SPEEDS (clamped to the ends of the list)."""
+        self.speed = max(0, min(len(SPEEDS) - 1, index))
+        self.tick_accumulator = 0.0
+        if self.worker:
+            self.worker.set_unlimited(SPEEDS[self.speed][1] is None)
+
+    def _ticks_due(self):
+        """Advance the accumulator by the last frame and take the whole ticks due from it."""
+        rate = SPEEDS[self.speed][1]
+        self.tick_accumulator += self.frame_seconds * rate
+        due = int(self.tick_accumulator / TICK_SECONDS)
+        self.tick_accumulator -= due * TICK_SECONDS
+        return due
+
     def update(self):
-        # Simulation ticks
-        self.tick_timer += 1
-        if self.tick_timer >= 60:  # Run simulation every 60 frames
-            self.tick_timer = 0
-            self.power_system.update(self.grid)
-            self.growth_system.update(self.grid)
-            self.demand_system.update(self.grid)
-            self.crime_system.update(self.grid)
-            self.land_value_system.update(self.grid)
-            self.fire_system.update(self.grid)  # v0.4.0
-            self.decay_system.update(self.grid, self.economy)  # v0.4.0
-            self.last_income = self.economy.collect_taxes(self.grid)
-            self.economy.deduct_upkeep(self.grid)
+        rate = SPEEDS[self.speed][1]
+        if self.worker:
+            # The worker applies edits as they come in and runs
+            # the ticks we request; it drops ticks it can't keep up with.
+            # At Max it runs ticks back to back on its own
+            if rate is not None:
+                due = self._ticks_due()
+                if due:
+                    self.worker.request_ticks(due)
+        else:
+            if rate is None:
+                # Run whole ticks until the frame's fast-forward budget is used up
+                start = time.perf_counter()
+                self.run_tick()
+                while (time.perf_counter() - start) * 1000.0 < FAST_BUDGET_MS:
+                    self.run_tick()
+            else:
+                due = self._ticks_due()
+                if due > 1:
+                    # Fast-forward: whole ticks while they fit in the budget;
+                    # ticks that don't fit are dropped, so a slow city runs
+                    # slower instead of falling further behind every frame
+                    start = time.perf_counter()
+                    for _ in range(due - 1):
+                        self.run_tick()
+                        if (time.perf_counter() - start) * 1000.0 >= FAST_BUDGET_MS:
+                            break
+                if due:
+                    # The last tick due is spread over the following frames
+                    self.scheduler.start_tick()
+                self.scheduler.run()
+        
+        self._measure_tps()
+        
+        while self.collapses:
+            self.notifications.notify_building_collapse(*self.collapses.popleft())
         
         # Notification timer countdown (legacy system for save/load)
         if self.notification_timer > 0:
@@ -333,8 +369,44 @@ class Game:
         # v0.4.0: Update toast notifications
         self.notifications.update(self)
 
+    def run_tick(self):
+        """Run one whole simulation tick now."""
+        self.simulation.run_tick()
+    
+    # The city lives on the simulation; these forward to it so the renderer,
+    # notifications and HUD code read it the way they always have
+    grid = property(lambda self: self.simulation.grid)
+    scheduler = property(lambda self: self.simulation.scheduler)
+    economy = property(lambda self: self.simulation.economy)
+    demand_system = property(lambda self: self.simulation.demand_system)
+    fire_system = property(lambda self: self.simulation.fire_system)
+    collapses = property(lambda self: self.simulation.collapses)
+    last_income = property(lambda self: self.simulation.last_income)
+    
+    def _measure_tps(self):
+        now = time.perf_counter()
+        samples = self.tps_samples
+        samples.append((now, self.simulation.tick))
+        while now - samples[0][0] > TPS_WINDOW:
+            samples.popleft()
+        oldest_time, oldest_tick = samples[0]
+        if now > oldest_time:
+            self.tps = (samples[-1][1] - oldest_tick) / (now - oldest_time)
+    
+    @property
+    def view(self):
+        """The grid to draw: the worker's snapshot when threaded, else the live grid."""
+        return self.worker.front if self.worker else self.grid
+    
     def render(self):
-        self.renderer.draw(overlay_mode=self.current_overlay)
+        view = self.view
+        self.renderer.grid = view
+        fire_coverage = None
+        if self.current_overlay == 'fire':
+            if not self.worker:
+                self.fire_system.update_coverage(self.grid)
+            fire_coverage = self.fire_system.coverage
+        self.renderer.draw(overlay_mode=self.current_overlay, fire_coverage=fire_coverage)
         
         # Draw Toolbar background
         toolbar_rect = pygame.Rect(0, self.screen_height - TOOLBAR_HEIGHT, self.screen_width, TOOLBAR_HEIGHT)
@@ -365,7 +437,7 @@ class Game:
         self.screen.blit(money_text, (10, 70))
         
         # Stats - Population
-        total_pop = sum(tile.population for row in self.grid.tiles for tile in row)
+        total_pop = view.stats.population()
         pop_text = self.font_large.render(f'Pop: {total_pop}', True, (255, 255, 255))
         self.screen.blit(pop_text, (self.screen_width - 200, 10))
         
@@ -374,11 +446,15 @@ class Game:
             income_text = self.font.render(f'+${self.last_income}/tick', True, (150, 255, 150))
             self.screen.blit(income_text, (self.screen_width - 200, 35))
         
+        # Simulation speed and achieved ticks per second
+        speed_text = self.font.render(f'Speed: {SPEEDS[self.speed][0]} | {self.tps:.1f} ticks/s', True, (200, 200, 255))
+        self.screen.blit(speed_text, (self.screen_width - 420, 10))
+        
         # RCI Demand Bars
         self._draw_rci_bars()
         
         # Instructions
-        instructions = "1-8,0: Tools | C/V/P/F: Overlays | B: Budget | Ctrl+S/L: Save/Load"
+        instructions = "1-8,0: Tools | C/V/P/F/R: Overlays | B: Budget | Space/-/=: Speed | Ctrl+S/L: Save/Load"
         instr_surf = self.font.render(instructions, True, (180, 180, 180))
         self.screen.blit(instr_surf, (10, 40))
         
@@ -386,6 +462,8 @@ class Game:
         if self.current_overlay:
             overlay_text = self.font.render(f'Overlay: {self.current_overlay.upper().replace("_", " ")}', True, (255, 200, 100))
             self.screen.blit(overlay_text, (10, 90))
+            if self.current_overlay in ('crime', 'land_value'):
+                self._draw_overlay_histogram()
         
         # Draw drag preview or regular cursor
         drag_rect = self.get_drag_rect()
@@ -457,16 +535,34 @@ class Game:
             label_surf = self.font.render(label, True, (255, 255, 255))
             self.screen.blit(label_surf, (x + 5, bar_y + bar_height + 2))
     
+    def _draw_overlay_histogram(self):
+        """Draw the tile distribution of the active crime / land value overlay."""
+        land_values, crime = self.view.stats.histograms()
+        if self.current_overlay == 'crime':
+            counts, color = crime, (255, 80, 80)
+        else:
+            counts, color = land_values, (80, 220, 120)
+        
+        bar_width = 12
+        chart_height = 40
+        x0, y0 = 10, 110
+        chart_rect = pygame.Rect(x0, y0, len(counts) * (bar_width + 2) + 2, chart_height)
+        pygame.draw.rect(self.screen, (40, 40, 40), chart_rect)
+        
+        # Bars are scaled to the fullest bin; low to high from left to right
+        peak = max(1, int(counts.max()))
+        for i, count in enumerate(counts.tolist()):
+            bar_len = int(count / peak * (chart_height - 4))
+            if bar_len > 0:
+                pygame.draw.rect(self.screen, color, pygame.Rect(
+                    x0 + 2 + i * (bar_width + 2), y0 + chart_height - 2 - bar_len, bar_width, bar_len))
+        pygame.draw.rect(self.screen, (100, 100, 100), chart_rect, 1)
+    
     def _adjust_budget_value(self, direction):
         """Adjust the currently selected budget value."""
-        if self.budget_selection == 0:  # Tax rate
-            self.economy.tax_rate = max(1, min(20, self.economy.tax_rate + direction))
-        elif self.budget_selection == 1:  # Police funding
-            current = self.economy.service_funding['police']
-            self.economy.service_funding['police'] = max(0.0, min(1.0, current + direction * 0.1))
-        elif self.budget_selection == 2:  # Fire funding
-            current = self.economy.service_funding['fire']
-            self.economy.service_funding['fire'] = max(0.0, min(1.0, current + direction * 0.1))
+        # Tax rate, police funding, fire funding
+        setting = ('tax_rate', 'police', 'fire')[self.budget_selection]
+        self.submit(('budget', setting, direction))
     
     def _draw_budget_panel(self):
         """Draw the budget panel overlay."""
@@ -559,105 +655,68 @@ class Game:
     
     def save_game(self, filepath='saves/city.json'):
         """Save the current game state to a JSON file."""
-        # Ensure saves directory exists
-        os.makedirs(os.path.dirname(filepath), exist_ok=True)
-        
-        # Serialize grid
-        tiles_data = []
-        for x in range(self.grid.width):
-            for y in range(self.grid.height):
-                tile = self.grid.tiles[x][y]
-                # Only save non-default tiles to reduce file size
-                if (tile.type != 'grass' or tile.has_power_line or tile.population > 0 or
-                    tile.is_on_fire or tile.is_burned or tile.building_health < 1.0):
-                    tiles_data.append({
-                        'x': x,
-                        'y': y,
-                        'type': tile.type,
-                        'has_power_line': tile.has_power_line,
-                        'population': tile.population,
-                        # v0.4.0: Fire state
-                        'is_on_fire': tile.is_on_fire,
-                        'fire_intensity': tile.fire_intensity,
-                        'is_burned': tile.is_burned,
-                        'building_health': tile.building_health,
-                    })
-        
-        save_data = {
-            'version': '0.4.0',
-            'grid': {
-                'width': self.grid.width,
-                'height': self.grid.height,
-                'tiles': tiles_data,
-            },
-            'economy': self.economy.to_dict(),
-            'camera': {
+        # Keep the simulation thread out while we read the city
+        with self.worker.lock if self.worker else nullcontext():
+            # Ensure saves directory exists
+            os.makedirs(os.path.dirname(filepath), exist_ok=True)
+        
+            save_data = self.simulation.to_dict()
+            save_data['camera'] = {
                 'x': self.renderer.camera_x,
                 'y': self.renderer.camera_y,
             }
-        }
         
-        with open(filepath, 'w') as f:
-            json.dump(save_data, f, indent=2)
+            with open(filepath, 'w') as f:
+                json.dump(save_data, f, indent=2)
         
-        self.notification_message = "Game Saved!"
-        self.notification_timer = 120  # 2 seconds at 60fps
+            self.notification_message = "Game Saved!"
+            self.notification_timer = 120  # 2 seconds at 60fps
     
     def load_game(self, filepath='saves/city.json'):
         """Load game state from a JSON file."""
-        if not os.path.exists(filepath):
-            self.notification_message = "No save file found!"
-            self.notification_timer = 120
-            return False
-        
-        try:
-            with open(filepath, 'r') as f:
-                save_data = json.load(f)
-            
-            # Reset grid
-            self.grid = Grid(save_data['grid']['width'], save_data['grid']['height'])
-            self.renderer.grid = self.grid
-            
-            # Restore tiles
-            for tile_data in save_data['grid']['tiles']:
-                x, y = tile_data['x'], tile_data['y']
-                tile = self.grid.get_tile(x, y)
-                if tile:
-                    tile.type = tile_data['type']
-                    tile.has_power_line = tile_data.get('has_power_line', False)
-                    tile.population = tile_data.get('population', 0)
-                    # v0.4.0: Fire state
-                    tile.is_on_fire = tile_data.get('is_on_fire', False)
-                    tile.fire_intensity = tile_data.get('fire_intensity', 0.0)
-                    tile.is_burned = tile_data.get('is_burned', False)
-                    tile.building_health = tile_data.get('building_health', 1.0)
+        # Keep the simulation thread out while we replace the city
+        with self.worker.lock if self.worker else nullcontext():
+            if not os.path.exists(filepath):
+                self.notification_message = "No save file found!"
+                self.notification_timer = 120
+                return False
+        
+            try:
+                with open(filepath, 'r') as f:
+                    save_data = json.load(f)
             
-            # Restore economy
-            self.economy.from_dict(save_data.get('economy', {}))
+                self.simulation.load_dict(save_data)
+                self.renderer.grid = self.grid
+                self.tps_samples.clear()  # The tick count restarts with the city
             
-            # Restore camera
-            camera_data = save_data.get('camera', {})
-            self.renderer.camera_x = camera_data.get('x', 0)
-            self.renderer.camera_y = camera_data.get('y', 0)
+                # Restore camera
+                camera_data = save_data.get('camera', {})
+                self.renderer.camera_x = camera_data.get('x', 0)
+                self.renderer.camera_y = camera_data.get('y', 0)
             
-            # Run systems to update state
-            self.power_system.update(self.grid)
-            self.demand_system.update(self.grid)
+                if self.worker:
+                    self.worker.publish()
             
-            self.notification_message = "Game Loaded!"
-            self.notification_timer = 120
-            return True
-        except Exception as e:
-            self.notification_message = f"Load failed: {e}"
-            self.notification_timer = 180
-            return False
+                self.notification_message = "Game Loaded!"
+                self.notification_timer = 120
+                return True
+            except Exception as e:
+                self.notification_message = f"Load failed: {e}"
+                self.notification_timer = 180
+                return False
 
     def run(self):
         while self.running:
             self.handle_input()
             self.update()
             self.render()
-            self.clock.tick(60)
+            # Real frame time (capped so a stall doesn't become a burst of ticks)
+            self.frame_seconds = min(self.clock.tick(60), 250) / 1000.0
 
+        if self.worker:
+            self.worker.stop()
+        if self.record_path:
+            self.simulation.stop_recording().save(self.record_path)
+        self.simulation.close()
         pygame.quit()
         sys.exit()
@@ -1,65 +1,597 @@
-import random
+import numpy as np
+
+from engine.journal import (ChangeJournal, CHANGE_TYPE, CHANGE_POPULATION,
+                            CHANGE_FIRE, CHANGE_HEALTH, CHANGE_POWER,
+                            CHANGE_LAND_VALUE, CHANGE_CRIME, CHANGE_ROAD_ACCESS)
+
+# Tile types in type-code order. The grid stores the codes, saves store the names.
+TILE_TYPES = [
+    'grass',
+    'road',
+    'residential',
+    'commercial',
+    'industrial',
+    'power_plant',
+    'police',
+    'fire_station',
+]
+TYPE_CODES = {name: code for code, name in enumerate(TILE_TYPES)}
+
+# Type codes, for comparisons that would otherwise hash strings in hot loops
+GRASS = TYPE_CODES['grass']
+ROAD = TYPE_CODES['road']
+RESIDENTIAL = TYPE_CODES['residential']
+COMMERCIAL = TYPE_CODES['commercial']
+INDUSTRIAL = TYPE_CODES['industrial']
+POWER_PLANT = TYPE_CODES['power_plant']
+POLICE = TYPE_CODES['police']
+FIRE_STATION = TYPE_CODES['fire_station']
+
+
+def type_table(values, default=0, dtype=float):
+    """
+    Build a lookup table indexed by type code from a {type name: value} dict.
+
+    Names that are not tile types (e.g. the 'power_line' overlay) are ignored,
+    so tables can be built straight from the existing per-type dicts and
+    applied to a whole layer with table[grid.type_code].
+    """
+    table = np.full(len(TILE_TYPES), default, dtype=dtype)
+    for name, value in values.items():
+        if name in TYPE_CODES:
+            table[TYPE_CODES[name]] = value
+    return table
+
+
+# Per-type flags
+IS_ZONE = type_table({'residential': True, 'commercial': True, 'industrial': True}, False, bool)
+IS_BUILDING = type_table({'residential': True, 'commercial': True, 'industrial': True,
+                          'power_plant': True, 'police': True, 'fire_station': True}, False, bool)
+# Power conductors: power_plant and RCI zones (plus the power_line overlay)
+CONDUCTS_POWER = type_table({'power_plant': True, 'residential': True, 'commercial': True,
+                             'industrial': True}, False, bool)
+
+# Buildings whose positions the grid keeps in its BuildingRegistry
+SERVICE_TYPES = (POWER_PLANT, POLICE, FIRE_STATION)
+
+# Side length of a chunk. Chunks are only allocated once something is written to them.
+CHUNK_SIZE = 32
+
+# Tile layers stored in every chunk: name -> (dtype, value on untouched grass)
+LAYERS = {
+    'type_code': (np.uint8, GRASS),
+    'has_power_line': (bool, False),  # Power lines are an overlay, not a type
+    'is_powered': (bool, False),
+    'population': (np.int16, 0),
+    # v0.3.0: City services
+    'land_value': (np.uint8, 50),  # 0-100 scale
+    'crime_level': (np.float64, 0.0),  # 0.0-1.0 scale
+    # v0.4.0: Fire & Safety
+    'is_on_fire': (bool, False),
+    'fire_intensity': (np.float64, 0.0),  # 0.0-1.0 scale
+    'is_burned': (bool, False),  # True if building was destroyed by fire
+    'building_health': (np.float64, 1.0),  # 0.0-1.0 scale, decays over time
+    # Derived: True next to a road, maintained by Grid as roads change
+    'has_road_access': (bool, False),
+}
+
+
+def _layer_property(name, convert, change=0):
+    """
+    Tile attribute that reads and writes one layer of the tile's chunk.
+
+    Writes are recorded in the grid's change journal under the given flag.
+    """
+    default = convert(LAYERS[name][1])
+
+    def fget(tile):
+        chunk = tile.grid.chunk_at(tile.x, tile.y)
+        if chunk is None:
+            return default
+        return convert(getattr(chunk, name)[tile.x - chunk.x0, tile.y - chunk.y0])
+
+    def fset(tile, value):
+        chunk = tile.grid.ensure_chunk(tile.x, tile.y)
+        getattr(chunk, name)[tile.x - chunk.x0, tile.y - chunk.y0] = value
+        if change:
+            tile.grid.journal.record_tile(change, tile.x, tile.y)
+
+    return property(fget, fset)
+
 
 class Tile:
-    def __init__(self, x, y):
+    """
+    Lightweight view of a single grid cell.
+
+    The data lives in the grid's chunks; a Tile only remembers its position,
+    so creating one is cheap and writes go straight back to the grid.
+    """
+
+    __slots__ = ('grid', 'x', 'y')
+
+    def __init__(self, grid, x, y):
+        self.grid = grid
         self.x = x
         self.y = y
-        self.type = 'grass'  # Types: grass, road, residential, commercial, industrial, power_plant, police
-        self.has_power_line = False  # Power lines are an overlay, not a type
-        self.is_powered = False
-        self.population = 0
-        self.structure = None # For complex structures if needed later
-        self.sprite_index = 0 # For variation
-        # v0.3.0: City services
-        self.land_value = 50  # 0-100 scale
-        self.crime_level = 0.0  # 0.0-1.0 scale
-        # v0.4.0: Fire & Safety
-        self.is_on_fire = False
-        self.fire_intensity = 0.0  # 0.0-1.0 scale
-        self.is_burned = False  # True if building was destroyed by fire
-        self.building_health = 1.0  # 0.0-1.0 scale, decays over time
+
+    has_power_line = _layer_property('has_power_line', bool, CHANGE_TYPE)
+    is_powered = _layer_property('is_powered', bool, CHANGE_POWER)
+    population = _layer_property('population', int, CHANGE_POPULATION)
+    # v0.3.0: City services
+    land_value = _layer_property('land_value', int, CHANGE_LAND_VALUE)
+    crime_level = _layer_property('crime_level', float, CHANGE_CRIME)
+    # v0.4.0: Fire & Safety
+    is_on_fire = _layer_property('is_on_fire', bool, CHANGE_FIRE)
+    fire_intensity = _layer_property('fire_intensity', float, CHANGE_FIRE)
+    is_burned = _layer_property('is_burned', bool, CHANGE_HEALTH)
+    building_health = _layer_property('building_health', float, CHANGE_HEALTH)
+    has_road_access = _layer_property('has_road_access', bool)
+
+    @property
+    def type_code(self):
+        chunk = self.grid.chunk_at(self.x, self.y)
+        if chunk is None:
+            return GRASS
+        return int(chunk.type_code[self.x - chunk.x0, self.y - chunk.y0])
+
+    @type_code.setter
+    def type_code(self, value):
+        self.grid._write_type_code(self.grid.ensure_chunk(self.x, self.y), self.x, self.y, value)
+        self.grid.journal.record_tile(CHANGE_TYPE, self.x, self.y)
+
+    @property
+    def type(self):
+        return TILE_TYPES[self.type_code]
+
+    @type.setter
+    def type(self, value):
+        self.type_code = TYPE_CODES[value]
 
     @property
     def needs_power(self):
         """Return True if this tile type needs power to function."""
-        return self.type in ['residential', 'commercial', 'industrial']
+        return bool(IS_ZONE[self.type_code])
 
     def __repr__(self):
         return f"Tile({self.x}, {self.y}, {self.type}, power_line={self.has_power_line})"
 
+
+class Chunk:
+    """
+    A CHUNK_SIZE x CHUNK_SIZE block of the map holding one array per layer.
+
+    Layers are indexed as layer[x - x0, y - y0]. Chunks on the right and
+    bottom edges are clipped to the map size.
+    """
+
+    def __init__(self, cx, cy, width, height):
+        self.cx = cx
+        self.cy = cy
+        self.x0 = cx * CHUNK_SIZE
+        self.y0 = cy * CHUNK_SIZE
+        self.width = width
+        self.height = height
+        for name, (dtype, default) in LAYERS.items():
+            setattr(self, name, np.full((width, height), default, dtype=dtype))
+
+    def copy(self, writeable=True):
+        """Return a copy of the chunk with its own layer arrays."""
+        chunk = Chunk.__new__(Chunk)
+        chunk.__dict__.update(self.__dict__)
+        for name in LAYERS:
+            layer = getattr(self, name).copy()
+            layer.flags.writeable = writeable
+            setattr(chunk, name, layer)
+        return chunk
+
+    def __repr__(self):
+        return f"Chunk({self.cx}, {self.cy})"
+
+
+class BuildingRegistry:
+    """
+    Positions of service buildings (SERVICE_TYPES) by type code.
+
+    The grid updates it on every type change, so systems that need the
+    police stations, fire stations or power plants read it instead of
+    scanning the map.
+    """
+
+    def __init__(self):
+        self.by_type = {code: set() for code in SERVICE_TYPES}
+
+    def move(self, x, y, old_code, new_code):
+        """Update the registry for a tile that changed from old_code to new_code."""
+        if old_code in self.by_type:
+            self.by_type[old_code].discard((x, y))
+        if new_code in self.by_type:
+            self.by_type[new_code].add((x, y))
+
+    def positions(self, code):
+        """Return the positions of every building of a type, in x-major order."""
+        return sorted(self.by_type[code])
+
+    def count(self, code):
+        return len(self.by_type[code])
+
+
+# Histogram bins for land value (0-100) and crime (0.0-1.0)
+HISTOGRAM_BINS = 10
+
+
+def land_value_bins(values):
+    """Return the histogram bin of each land value: 0-9, 10-19, ..., 90-100."""
+    return np.minimum(values // 10, HISTOGRAM_BINS - 1).astype(np.uint8)
+
+
+def crime_bins(levels):
+    """Return the histogram bin of each crime level: [0, 0.1), [0.1, 0.2), ..., [0.9, 1.0]."""
+    return np.minimum((levels * HISTOGRAM_BINS).astype(np.int64), HISTOGRAM_BINS - 1).astype(np.uint8)
+
+
+class CityStats:
+    """
+    Running totals over the whole map: tiles, population and powered
+    population per type, plus land value and crime histograms.
+
+    Totals follow the grid's change journal. refresh() recounts only the
+    chunks that changed since the last refresh, swapping their old counts
+    for the new ones, so reading a total costs nothing when nothing changed.
+    """
+
+    TRACKED = CHANGE_TYPE | CHANGE_POPULATION | CHANGE_POWER | CHANGE_LAND_VALUE | CHANGE_CRIME
+
+    def __init__(self, grid):
+        self.grid = grid
+        self.counts = None  # (cx, cy) -> the chunk's counts, as from _count_chunk
+
+    def refresh(self):
+        """Bring the totals up to date with the grid."""
+        changes = self.grid.journal.consume('stats', self.TRACKED)
+        if self.counts is None or changes.full:
+            self._recount()
+        elif changes:
+            for key in changes.chunk_keys(CHUNK_SIZE):
+                chunk = self.grid.chunks.get(key)
+                if chunk is not None:  # Only untouched grass lives outside allocated chunks
+                    self._update_chunk(chunk)
+
+    def _recount(self):
+        count = len(TILE_TYPES)
+        self.tile_counts = np.zeros(count, dtype=np.int64)
+        self.populations = np.zeros(count, dtype=np.int64)
+        self.powered_populations = np.zeros(count, dtype=np.int64)
+        self.land_value_histogram = np.zeros(HISTOGRAM_BINS, dtype=np.int64)
+        self.crime_histogram = np.zeros(HISTOGRAM_BINS, dtype=np.int64)
+        self.counts = {}
+        # Start from a map of plain grass and swap in each allocated chunk
+        self._add(self._grass_counts(self.grid.width * self.grid.height), 1)
+        for chunk in self.grid.iter_chunks():
+            self._update_chunk(chunk)
+
+    def _update_chunk(self, chunk):
+        key = (chunk.cx, chunk.cy)
+        old = self.counts.get(key)
+        if old is None:
+            old = self._grass_counts(chunk.width * chunk.height)
+        new = self.counts[key] = self._count_chunk(chunk)
+        self._add(old, -1)
+        self._add(new, 1)
+
+    def _count_chunk(self, chunk):
+        """Return (tile counts, populations, powered populations, land value bins, crime bins) of a chunk."""
+        count = len(TILE_TYPES)
+        types = chunk.type_code.ravel()
+        populations = chunk.population.ravel()
+        return (np.bincount(types, minlength=count),
+                np.bincount(types, weights=populations, minlength=count).astype(np.int64),
+                np.bincount(types, weights=populations * chunk.is_powered.ravel(),
+                            minlength=count).astype(np.int64),
+                np.bincount(land_value_bins(chunk.land_value.ravel()), minlength=HISTOGRAM_BINS),
+                np.bincount(crime_bins(chunk.crime_level.ravel()), minlength=HISTOGRAM_BINS))
+
+    def _grass_counts(self, area):
+        """Counts of an area of untouched grass."""
+        counts = (np.zeros(len(TILE_TYPES), dtype=np.int64), np.zeros(len(TILE_TYPES), dtype=np.int64),
+                  np.zeros(len(TILE_TYPES), dtype=np.int64), np.zeros(HISTOGRAM_BINS, dtype=np.int64),
+                  np.zeros(HISTOGRAM_BINS, dtype=np.int64))
+        counts[0][GRASS] = area
+        counts[3][land_value_bins(LAYERS['land_value'][1])] = area
+        counts[4][0] = area
+        return counts
+
+    def _add(self, counts, sign):
+        tile_counts, populations, powered_populations, land_values, crime = counts
+        self.tile_counts += sign * tile_counts
+        self.populations += sign * populations
+        self.powered_populations += sign * powered_populations
+        self.land_value_histogram += sign * land_values
+        self.crime_histogram += sign * crime
+
+    def copy(self, grid):
+        """
+        Return a copy of the current totals for a snapshot of the grid.
+
+        The copy starts its journal cursor at the snapshot's present, so it
+        never has to recount a snapshot nobody writes to.
+        """
+        self.refresh()
+        stats = CityStats(grid)
+        stats.counts = dict(self.counts)  # Count tuples are replaced, never modified
+        for name in ('tile_counts', 'populations', 'powered_populations',
+                     'land_value_histogram', 'crime_histogram'):
+            setattr(stats, name, getattr(self, name).copy())
+        grid.journal.clear('stats')
+        return stats
+
+    def tile_count(self, code):
+        """Number of tiles of a type."""
+        self.refresh()
+        return int(self.tile_counts[code])
+
+    def population(self, code=None):
+        """Population of a type, or of the whole city."""
+        self.refresh()
+        if code is None:
+            return int(self.populations.sum())
+        return int(self.populations[code])
+
+    def powered_population(self, code):
+        """Population living on powered tiles of a type."""
+        self.refresh()
+        return int(self.powered_populations[code])
+
+    def histograms(self):
+        """Return (land value histogram, crime histogram) as arrays of HISTOGRAM_BINS tile counts."""
+        self.refresh()
+        return self.land_value_histogram.copy(), self.crime_histogram.copy()
+
+
 class Grid:
+    """
+    City map stored as lazily allocated chunks of tile layers.
+
+    A chunk that nobody has written to is not allocated and reads as plain
+    grass, so memory grows with the built-up area rather than the map size.
+    Systems iterate the allocated chunks; get_tile() hands out Tile views for
+    code that wants a single cell.
+
+    Every mutation is recorded in `journal` so systems can find out what
+    changed since they last looked (see engine.journal).
+    """
+
     def __init__(self, width, height):
         self.width = width
         self.height = height
-        self.tiles = [[Tile(x, y) for y in range(height)] for x in range(width)]
+        self.chunks = {}  # (cx, cy) -> Chunk
+        self.journal = ChangeJournal()
+        self.buildings = BuildingRegistry()
+        self.stats = CityStats(self)
+
+    def chunk_at(self, x, y):
+        """Return the chunk containing (x, y), or None if it is untouched grass."""
+        return self.chunks.get((x // CHUNK_SIZE, y // CHUNK_SIZE))
+
+    def ensure_chunk(self, x, y):
+        """Return the chunk containing (x, y), allocating it if needed."""
+        key = (x // CHUNK_SIZE, y // CHUNK_SIZE)
+        chunk = self.chunks.get(key)
+        if chunk is None:
+            cx, cy = key
+            chunk = Chunk(cx, cy,
+                          min(CHUNK_SIZE, self.width - cx * CHUNK_SIZE),
+                          min(CHUNK_SIZE, self.height - cy * CHUNK_SIZE))
+            self.chunks[key] = chunk
+        return chunk
+
+    def snapshot(self, previous=None):
+        """
+        Return a read-only copy of the grid that another thread can draw from.
+
+        Chunks unchanged since previous (the last snapshot of this grid) are
+        shared with it rather than copied, so a snapshot costs about as much
+        as the chunks that changed. The copy has its own stats and building
+        registry; writing to its layers raises an error.
+        """
+        changes = self.journal.consume('snapshot')
+        snapshot = Grid(self.width, self.height)
+        if previous is None or changes.full or (previous.width, previous.height) != (self.width, self.height):
+            stale = set(self.chunks)
+        else:
+            snapshot.chunks.update((key, chunk) for key, chunk in previous.chunks.items() if key in self.chunks)
+            stale = changes.chunk_keys(CHUNK_SIZE) | (set(self.chunks) - set(previous.chunks))
+        for key in stale:
+            chunk = self.chunks.get(key)
+            if chunk is not None:
+                snapshot.chunks[key] = chunk.copy(writeable=False)
+        for code, positions in self.buildings.by_type.items():
+            snapshot.buildings.by_type[code] = set(positions)
+        snapshot.stats = self.stats.copy(snapshot)
+        return snapshot
+
+    def iter_chunks(self):
+        """Return the allocated chunks. Everything outside them is untouched grass."""
+        return list(self.chunks.values())
+
+    def neighbor_chunk_keys(self, chunk):
+        """Return the keys of the (up to 8) chunks around a chunk, allocated or not."""
+        max_cx = (self.width - 1) // CHUNK_SIZE
+        max_cy = (self.height - 1) // CHUNK_SIZE
+        keys = []
+        for cx in range(max(0, chunk.cx - 1), min(max_cx, chunk.cx + 1) + 1):
+            for cy in range(max(0, chunk.cy - 1), min(max_cy, chunk.cy + 1) + 1):
+                if (cx, cy) != (chunk.cx, chunk.cy):
+                    keys.append((cx, cy))
+        return keys
+
+    def chunk_bounds(self, key):
+        """Return (x0, y0, x1, y1) of the chunk with the given key, allocated or not."""
+        cx, cy = key
+        x0, y0 = cx * CHUNK_SIZE, cy * CHUNK_SIZE
+        return x0, y0, min(x0 + CHUNK_SIZE, self.width), min(y0 + CHUNK_SIZE, self.height)
+
+    def chunk_keys_in(self, x0, y0, x1, y1):
+        """Return the keys of the chunks overlapping [x0, x1) x [y0, y1), clipped to the map."""
+        x0, y0 = max(0, x0), max(0, y0)
+        x1, y1 = min(self.width, x1), min(self.height, y1)
+        if x0 >= x1 or y0 >= y1:
+            return []
+        return [(cx, cy)
+                for cx in range(x0 // CHUNK_SIZE, (x1 - 1) // CHUNK_SIZE + 1)
+                for cy in range(y0 // CHUNK_SIZE, (y1 - 1) // CHUNK_SIZE + 1)]
+
+    def split_by_chunk(self, xs, ys):
+        """
+        Group tile positions by chunk.
+
+        Returns a list of (key, lx, ly, index) where lx, ly are the positions
+        local to the chunk and index selects them from xs / ys.
+        """
+        xs = np.asarray(xs, dtype=np.int64)
+        ys = np.asarray(ys, dtype=np.int64)
+        if len(xs) == 0:
+            return []
+        cxs, cys = xs // CHUNK_SIZE, ys // CHUNK_SIZE
+        order = np.lexsort((cys, cxs))
+        cxs, cys = cxs[order], cys[order]
+        starts = np.flatnonzero(np.r_[True, (cxs[1:] != cxs[:-1]) | (cys[1:] != cys[:-1])])
+        groups = []
+        for start, end in zip(starts.tolist(), np.r_[starts[1:], len(order)].tolist()):
+            index = order[start:end]
+            cx, cy = int(cxs[start]), int(cys[start])
+            groups.append(((cx, cy), xs[index] - cx * CHUNK_SIZE, ys[index] - cy * CHUNK_SIZE, index))
+        return groups
 
     def get_tile(self, x, y):
         if 0 <= x < self.width and 0 <= y < self.height:
-            return self.tiles[x][y]
+            return Tile(self, x, y)
         return None
 
+    def find(self, mask_of):
+        """
+        Return the (x, y) positions where mask_of(chunk) is True, in x-major order.
+
+        mask_of receives each allocated chunk and returns a boolean array of the
+        chunk's shape, e.g. ``grid.find(lambda c: c.is_on_fire)``.
+        """
+        xs, ys = [], []
+        for chunk in self.chunks.values():
+            lx, ly = np.nonzero(mask_of(chunk))
+            if len(lx):
+                xs.append(lx + chunk.x0)
+                ys.append(ly + chunk.y0)
+        if not xs:
+            return []
+        xs = np.concatenate(xs)
+        ys = np.concatenate(ys)
+        order = np.lexsort((ys, xs))
+        return list(zip(xs[order].tolist(), ys[order].tolist()))
+
+    def window(self, name, x0, y0, x1, y1):
+        """
+        Return a copy of one layer over the rectangle [x0, x1) x [y0, y1).
+
+        The rectangle may extend past the map edges; cells outside the map or
+        in unallocated chunks hold the layer's grass default.
+        """
+        dtype, default = LAYERS[name]
+        out = np.full((x1 - x0, y1 - y0), default, dtype=dtype)
+        cx_start, cx_end = max(0, x0) // CHUNK_SIZE, (min(x1, self.width) - 1) // CHUNK_SIZE
+        cy_start, cy_end = max(0, y0) // CHUNK_SIZE, (min(y1, self.height) - 1) // CHUNK_SIZE
+        for cx in range(cx_start, cx_end + 1):
+            for cy in range(cy_start, cy_end + 1):
+                chunk = self.chunks.get((cx, cy))
+                if chunk is None:
+                    continue
+                ax0, ax1 = max(x0, chunk.x0), min(x1, chunk.x0 + chunk.width)
+                ay0, ay1 = max(y0, chunk.y0), min(y1, chunk.y0 + chunk.height)
+                out[ax0 - x0:ax1 - x0, ay0 - y0:ay1 - y0] = \
+                    getattr(chunk, name)[ax0 - chunk.x0:ax1 - chunk.x0, ay0 - chunk.y0:ay1 - chunk.y0]
+        return out
+
+    def fill(self, name, positions, value, change=0):
+        """Set one layer to value at each (x, y) position, journaling it under change."""
+        for x, y in positions:
+            chunk = self.ensure_chunk(x, y)
+            getattr(chunk, name)[x - chunk.x0, y - chunk.y0] = value
+        if change and positions:
+            xs, ys = zip(*positions)
+            self.journal.record(change, xs, ys)
+
+    def record_chunk_changes(self, change, chunk, mask):
+        """Journal the tiles of a chunk where mask is True, after a bulk layer write."""
+        if not self.journal.recording:
+            return
+        lx, ly = np.nonzero(mask)
+        self.journal.record(change, lx + chunk.x0, ly + chunk.y0)
+
+    def chunk_window(self, name, chunk, radius):
+        """Return one layer over a chunk plus a border of radius cells on every side."""
+        return self.window(name, chunk.x0 - radius, chunk.y0 - radius,
+                           chunk.x0 + chunk.width + radius, chunk.y0 + chunk.height + radius)
+
+    def _write_type_code(self, chunk, x, y, code):
+        """Store a tile's type code and keep the building registry in step."""
+        lx, ly = x - chunk.x0, y - chunk.y0
+        old_code = int(chunk.type_code[lx, ly])
+        chunk.type_code[lx, ly] = code
+        self.buildings.move(x, y, old_code, code)
+        if (old_code == ROAD) != (code == ROAD):
+            self._update_road_access(x, y)
+
+    def _update_road_access(self, x, y):
+        """Refresh has_road_access on the four neighbors of a tile that became or stopped being a road."""
+        for nx, ny in ((x - 1, y), (x + 1, y), (x, y - 1), (x, y + 1)):
+            if not (0 <= nx < self.width and 0 <= ny < self.height):
+                continue
+            access = any(self._is_road(ax, ay)
+                         for ax, ay in ((nx - 1, ny), (nx + 1, ny), (nx, ny - 1), (nx, ny + 1)))
+            chunk = self.chunk_at(nx, ny)
+            if chunk is None:
+                if not access:
+                    continue
+                chunk = self.ensure_chunk(nx, ny)
+            if chunk.has_road_access[nx - chunk.x0, ny - chunk.y0] != access:
+                chunk.has_road_access[nx - chunk.x0, ny - chunk.y0] = access
+                self.journal.record_tile(CHANGE_ROAD_ACCESS, nx, ny)
+
+    def _is_road(self, x, y):
+        if not (0 <= x < self.width and 0 <= y < self.height):
+            return False
+        chunk = self.chunk_at(x, y)
+        return chunk is not None and chunk.type_code[x - chunk.x0, y - chunk.y0] == ROAD
+
     def set_tile_type(self, x, y, type_name):
-        tile = self.get_tile(x, y)
-        if tile:
-            tile.type = type_name
+        if 0 <= x < self.width and 0 <= y < self.height:
+            code = TYPE_CODES[type_name]
+            if code == GRASS and self.chunk_at(x, y) is None:
+                return True  # Already untouched grass
+            chunk = self.ensure_chunk(x, y)
+            lx, ly = x - chunk.x0, y - chunk.y0
+            self._write_type_code(chunk, x, y, code)
             # Reset properties when type changes
-            tile.is_powered = False
-            tile.population = 0
+            chunk.is_powered[lx, ly] = False
+            chunk.population[lx, ly] = 0
+            change = CHANGE_TYPE | CHANGE_POPULATION
             # Clear power line when bulldozing to grass
-            if type_name == 'grass':
-                tile.has_power_line = False
+            if code == GRASS:
+                chunk.has_power_line[lx, ly] = False
                 # v0.4.0: Clear fire/damage state
-                tile.is_on_fire = False
-                tile.fire_intensity = 0.0
-                tile.is_burned = False
-                tile.building_health = 1.0
+                chunk.is_on_fire[lx, ly] = False
+                chunk.fire_intensity[lx, ly] = 0.0
+                chunk.is_burned[lx, ly] = False
+                chunk.building_health[lx, ly] = 1.0
+                change |= CHANGE_FIRE | CHANGE_HEALTH
+            self.journal.record_tile(change, x, y)
             return True
         return False
 
     def toggle_power_line(self, x, y):
         """Toggle power line overlay on a tile without changing its type."""
-        tile = self.get_tile(x, y)
-        if tile:
-            tile.has_power_line = not tile.has_power_line
+        if 0 <= x < self.width and 0 <= y < self.height:
+            chunk = self.ensure_chunk(x, y)
+            lx, ly = x - chunk.x0, y - chunk.y0
+            chunk.has_power_line[lx, ly] = not chunk.has_power_line[lx, ly]
+            self.journal.record_tile(CHANGE_TYPE, x, y)
             return True
         return False
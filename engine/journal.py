@@ -0,0 +1,154 @@
+"""
+Change journal for SimCity Clone.
+
+Records which tiles changed and how, so systems can update only the parts
+of the map that were touched instead of rescanning everything each tick.
+"""
+
+import numpy as np
+
+# Change flags (combine with |)
+CHANGE_TYPE = 1         # Tile type or power-line overlay
+CHANGE_POPULATION = 2
+CHANGE_FIRE = 4         # is_on_fire / fire_intensity
+CHANGE_HEALTH = 8       # building_health / is_burned
+CHANGE_POWER = 16       # is_powered
+CHANGE_LAND_VALUE = 32
+CHANGE_CRIME = 64
+CHANGE_ROAD_ACCESS = 128  # has_road_access, updated around road edits
+CHANGE_ALL = (CHANGE_TYPE | CHANGE_POPULATION | CHANGE_FIRE | CHANGE_HEALTH |
+              CHANGE_POWER | CHANGE_LAND_VALUE | CHANGE_CRIME | CHANGE_ROAD_ACCESS)
+
+
+class Change:
+    """One recorded edit: a set of tiles and the layers that changed on them."""
+
+    __slots__ = ('flags', 'xs', 'ys', 'bounds')
+
+    def __init__(self, flags, xs, ys):
+        self.flags = flags
+        self.xs = np.asarray(xs, dtype=np.int64)
+        self.ys = np.asarray(ys, dtype=np.int64)
+        # Bounding rectangle as (x0, y0, x1, y1), exclusive on the high side
+        self.bounds = (int(self.xs.min()), int(self.ys.min()),
+                       int(self.xs.max()) + 1, int(self.ys.max()) + 1)
+
+
+class DirtyRegion:
+    """
+    The changes a cursor has not consumed yet.
+
+    A region is `full` when the cursor is new (first read, or a freshly
+    loaded grid): the reader has no previous state, so everything counts
+    as changed.
+    """
+
+    def __init__(self, changes, full=False):
+        self.changes = changes
+        self.full = full
+        self.flags = CHANGE_ALL if full else 0
+        for change in changes:
+            self.flags |= change.flags
+
+    def __bool__(self):
+        return self.full or bool(self.changes)
+
+    def rects(self):
+        """Return the bounding rectangle of every change."""
+        return [change.bounds for change in self.changes]
+
+    def bounds(self):
+        """Return one rectangle covering every change, or None if nothing changed."""
+        if not self.changes:
+            return None
+        rects = self.rects()
+        return (min(r[0] for r in rects), min(r[1] for r in rects),
+                max(r[2] for r in rects), max(r[3] for r in rects))
+
+    def positions(self):
+        """Return the changed tiles as unique (xs, ys) arrays."""
+        if not self.changes:
+            empty = np.zeros(0, dtype=np.int64)
+            return empty, empty
+        xs = np.concatenate([change.xs for change in self.changes])
+        ys = np.concatenate([change.ys for change in self.changes])
+        # Deduplicate via a single key per tile
+        stride = int(ys.max()) + 1
+        keys = np.unique(xs * stride + ys)
+        return keys // stride, keys % stride
+
+    def chunk_keys(self, chunk_size):
+        """Return the set of chunk keys that contain a change."""
+        keys = set()
+        for change in self.changes:
+            x0, y0, x1, y1 = change.bounds
+            cx, cy = x0 // chunk_size, y0 // chunk_size
+            if (x1 - 1) // chunk_size == cx and (y1 - 1) // chunk_size == cy:
+                keys.add((cx, cy))  # Most changes stay inside one chunk
+            else:
+                keys.update(zip((change.xs // chunk_size).tolist(), (change.ys // chunk_size).tolist()))
+        return keys
+
+
+class ChangeJournal:
+    """
+    Append-only log of grid changes with one read cursor per consumer.
+
+    Each consumer (usually a system) reads the changes since its cursor with
+    read(name) and moves its cursor to the end with clear(name). Entries
+    every cursor has passed are dropped. Nothing is stored while no
+    consumer has registered.
+    """
+
+    def __init__(self):
+        self.changes = []
+        self.base = 0  # Sequence number of self.changes[0]
+        self.cursors = {}  # consumer name -> sequence number
+
+    @property
+    def recording(self):
+        """True once some consumer has registered a cursor."""
+        return bool(self.cursors)
+
+    def record(self, flags, xs, ys):
+        """Record that the tiles at (xs[i], ys[i]) changed in the given layers."""
+        if not self.cursors or len(xs) == 0:
+            return
+        self.changes.append(Change(flags, xs, ys))
+
+    def record_tile(self, flags, x, y):
+        """Record a change to a single tile."""
+        if self.cursors:
+            self.changes.append(Change(flags, (x,), (y,)))
+
+    def read(self, name, flags=CHANGE_ALL):
+        """
+        Return the DirtyRegion of changes matching flags since name's cursor.
+
+        The first read by a consumer registers its cursor and returns a full
+        region.
+        """
+        cursor = self.cursors.get(name)
+        if cursor is None:
+            self.cursors[name] = self.base + len(self.changes)
+            return DirtyRegion([], full=True)
+        changes = [change for change in self.changes[cursor - self.base:] if change.flags & flags]
+        return DirtyRegion(changes)
+
+    def clear(self, name):
+        """Move name's cursor past every recorded change."""
+        self.cursors[name] = self.base + len(self.changes)
+        self._compact()
+
+    def consume(self, name, flags=CHANGE_ALL):
+        """Read and clear in one step."""
+        region = self.read(name, flags)
+        self.clear(name)
+        return region
+
+    def _compact(self):
+        """Drop changes every cursor has already passed."""
+        oldest = min(self.cursors.values())
+        if oldest > self.base:
+            del self.changes[:oldest - self.base]
+            self.base = oldest
@@ -0,0 +1,199 @@
+"""
+Distance-falloff kernels and convolution helpers for SimCity Clone.
+
+Crime and land value sum contributions from nearby tiles weighted by
+1 / distance. Treating that as a convolution over blocks of chunks replaces
+a Python loop over every neighbor of every tile.
+"""
+
+from functools import lru_cache
+
+import numpy as np
+
+from engine.grid import CHUNK_SIZE
+
+# Chunks per side of a convolution block (256x256 tiles)
+BLOCK_CHUNKS = 8
+
+
+@lru_cache(maxsize=None)
+def falloff_distances(radius):
+    """
+    Return the (2r+1) x (2r+1) array of max(1, distance) for each offset.
+
+    dist[radius + dx, radius + dy] is computed exactly like the per-tile
+    loops did, so dividing by it reproduces their results bit for bit.
+    The array is cached and read-only.
+    """
+    dist = np.array([[max(1, ((dx ** 2) + (dy ** 2)) ** 0.5)
+                      for dy in range(-radius, radius + 1)]
+                     for dx in range(-radius, radius + 1)], dtype=float)
+    dist.flags.writeable = False
+    return dist
+
+
+@lru_cache(maxsize=None)
+def falloff_kernel(radius, include_center=True):
+    """
+    Return the (2r+1) x (2r+1) kernel of 1 / max(1, distance) weights.
+
+    kernel[radius + dx, radius + dy] is the weight of the tile at offset
+    (dx, dy). The array is cached and read-only.
+    """
+    kernel = 1.0 / falloff_distances(radius)
+    if not include_center:
+        kernel[radius, radius] = 0.0
+    kernel.flags.writeable = False
+    return kernel
+
+
+def _fast_length(n):
+    """Return the smallest 2-3-5 smooth number >= n (cheap FFT size)."""
+    while True:
+        m = n
+        for factor in (2, 3, 5):
+            while m % factor == 0:
+                m //= factor
+        if m == 1:
+            return n
+        n += 1
+
+
+def fft_convolve(padded, kernel):
+    """
+    Convolve a source window with a symmetric kernel using FFTs.
+
+    padded is the source with a border as wide as the kernel radius on every
+    side; the result covers the window without that border. Values match a
+    direct sum to floating-point tolerance, so callers should treat
+    magnitudes below ~1e-9 as zero.
+    """
+    radius = kernel.shape[0] // 2
+    shape = (_fast_length(padded.shape[0]), _fast_length(padded.shape[1]))
+    spectrum = np.fft.rfft2(padded, shape) * np.fft.rfft2(kernel, shape)
+    full = np.fft.irfft2(spectrum, shape)
+    return full[2 * radius:padded.shape[0], 2 * radius:padded.shape[1]]
+
+
+def falloff_sum(padded, radius, include_center=True):
+    """
+    Sum source / max(1, distance) over every offset within radius, directly.
+
+    padded has a border of radius cells on every side, as for fft_convolve.
+    Offsets are added in the same dx-major order, with the same division, as
+    the per-tile loops this replaces, so the result matches them bit for bit
+    (unlike an FFT, whose round-off can flip a later int() truncation).
+    """
+    dist = falloff_distances(radius)
+    width = padded.shape[0] - 2 * radius
+    height = padded.shape[1] - 2 * radius
+    total = np.zeros((width, height))
+    for dx in range(-radius, radius + 1):
+        for dy in range(-radius, radius + 1):
+            if dx == 0 and dy == 0 and not include_center:
+                continue
+            total += padded[radius + dx:radius + dx + width,
+                            radius + dy:radius + dy + height] / dist[radius + dx, radius + dy]
+    return total
+
+
+def chunk_blocks(grid, keys):
+    """
+    Group chunk keys into blocks of up to BLOCK_CHUNKS x BLOCK_CHUNKS chunks.
+
+    Yields (x0, y0, x1, y1, block_keys) where the rectangle is the bounding
+    box of block_keys, so a block with a single chunk stays chunk-sized.
+    """
+    blocks = {}
+    for key in keys:
+        blocks.setdefault((key[0] // BLOCK_CHUNKS, key[1] // BLOCK_CHUNKS), []).append(key)
+    for block_keys in blocks.values():
+        min_cx = min(key[0] for key in block_keys)
+        min_cy = min(key[1] for key in block_keys)
+        max_cx = max(key[0] for key in block_keys)
+        max_cy = max(key[1] for key in block_keys)
+        x0, y0 = min_cx * CHUNK_SIZE, min_cy * CHUNK_SIZE
+        x1 = min((max_cx + 1) * CHUNK_SIZE, grid.width)
+        y1 = min((max_cy + 1) * CHUNK_SIZE, grid.height)
+        yield x0, y0, x1, y1, block_keys
+
+
+class ChunkedField:
+    """
+    A sparse per-tile float field stored in the grid's chunk layout.
+
+    Systems use it for derived layers (coverage, accumulated contributions)
+    that they update by adding stamps instead of recomputing the map.
+    Chunks the field never touched read as zero.
+    """
+
+    def __init__(self, width, height):
+        self.width = width
+        self.height = height
+        self.chunks = {}  # (cx, cy) -> float array of the chunk's shape
+
+    def chunk(self, key, create=False):
+        """Return the array for a chunk key, or None if the field is zero there."""
+        layer = self.chunks.get(key)
+        if layer is None and create:
+            cx0, cy0 = key[0] * CHUNK_SIZE, key[1] * CHUNK_SIZE
+            layer = self.chunks[key] = np.zeros(
+                (min(CHUNK_SIZE, self.width - cx0), min(CHUNK_SIZE, self.height - cy0)))
+        return layer
+
+    def get(self, x, y):
+        layer = self.chunks.get((x // CHUNK_SIZE, y // CHUNK_SIZE))
+        if layer is None:
+            return 0.0
+        return float(layer[x % CHUNK_SIZE, y % CHUNK_SIZE])
+
+    def _overlapping(self, x0, y0, x1, y1, create):
+        """Yield (array, chunk slice, rect slice) for each chunk overlapping a rectangle."""
+        x0, y0 = max(0, x0), max(0, y0)
+        x1, y1 = min(self.width, x1), min(self.height, y1)
+        if x0 >= x1 or y0 >= y1:
+            return
+        for cx in range(x0 // CHUNK_SIZE, (x1 - 1) // CHUNK_SIZE + 1):
+            for cy in range(y0 // CHUNK_SIZE, (y1 - 1) // CHUNK_SIZE + 1):
+                cx0, cy0 = cx * CHUNK_SIZE, cy * CHUNK_SIZE
+                layer = self.chunk((cx, cy), create)
+                if layer is None:
+                    continue
+                ax0, ax1 = max(x0, cx0), min(x1, cx0 + layer.shape[0])
+                ay0, ay1 = max(y0, cy0), min(y1, cy0 + layer.shape[1])
+                yield (layer,
+                       (slice(ax0 - cx0, ax1 - cx0), slice(ay0 - cy0, ay1 - cy0)),
+                       (ax0, ay0, ax1, ay1))
+
+    def add(self, x0, y0, values):
+        """Add a 2D array whose [0, 0] lands on (x0, y0); parts off the map are dropped."""
+        w, h = values.shape
+        for layer, local, (ax0, ay0, ax1, ay1) in self._overlapping(x0, y0, x0 + w, y0 + h, True):
+            layer[local] += values[ax0 - x0:ax1 - x0, ay0 - y0:ay1 - y0]
+
+    def maximum(self, x0, y0, values):
+        """Raise the field to a 2D array whose [0, 0] lands on (x0, y0), where it is larger."""
+        w, h = values.shape
+        for layer, local, (ax0, ay0, ax1, ay1) in self._overlapping(x0, y0, x0 + w, y0 + h, True):
+            np.maximum(layer[local], values[ax0 - x0:ax1 - x0, ay0 - y0:ay1 - y0], out=layer[local])
+
+    def assign(self, x0, y0, values):
+        """Overwrite the field with a 2D array whose [0, 0] lands on (x0, y0)."""
+        w, h = values.shape
+        for layer, local, (ax0, ay0, ax1, ay1) in self._overlapping(x0, y0, x0 + w, y0 + h, True):
+            layer[local] = values[ax0 - x0:ax1 - x0, ay0 - y0:ay1 - y0]
+            if not layer.any():
+                # Drop chunks that are all zero again
+                del self.chunks[(ax0 // CHUNK_SIZE, ay0 // CHUNK_SIZE)]
+
+    def clear(self, x0, y0, x1, y1):
+        """Zero the rectangle [x0, x1) x [y0, y1)."""
+        for layer, local, _ in self._overlapping(x0, y0, x1, y1, False):
+            layer[local] = 0.0
+
+    def window(self, x0, y0, x1, y1):
+        """Return a dense copy of the rectangle [x0, x1) x [y0, y1)."""
+        out = np.zeros((x1 - x0, y1 - y0))
+        for layer, local, (ax0, ay0, ax1, ay1) in self._overlapping(x0, y0, x1, y1, False):
+            out[ax0 - x0:ax1 - x0, ay0 - y0:ay1 - y0] = layer[local]
+        return out
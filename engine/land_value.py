@@ -3,6 +3,12 @@ Land value system for SimCity Clone.
 Handles calculation of property values based on surroundings.
 """
 
+import numpy as np
+
+from engine.grid import type_table
+from engine.journal import CHANGE_LAND_VALUE, CHANGE_TYPE
+from engine.kernels import ChunkedField, chunk_blocks, falloff_sum
+
 # Land value modifiers
 VALUE_MODIFIERS = {
     'road': 5,          # Roads increase value
@@ -12,49 +18,120 @@ VALUE_MODIFIERS = {
     'industrial': -10,  # Industrial decreases value
     'power_plant': -15, # Power plants decrease value
 }
+VALUE_MODIFIER_TABLE = type_table(VALUE_MODIFIERS, dtype=int)
 
 
 class LandValueSystem:
-    """Calculates land value for all tiles."""
+    """
+    Calculates land value for all tiles.
+    
+    The neighbor modifier sum only depends on tile types, so it is kept
+    between ticks and recomputed only around tiles whose type changed. Each
+    tick then just applies the crime penalty. Modifiers are summed in the
+    same order as a per-tile loop, so results are bit-identical to it; full
+    rebuilds run on the pool if given.
+    """
+    
+    # How far a tile's modifier reaches (in tiles)
+    VALUE_RADIUS = 4
+    
+    def __init__(self, pool=None):
+        self.pool = pool  # StripPool for rebuilds, or None to run them here
+        self.modifiers = None  # ChunkedField of neighbor modifier sums
     
     def update(self, grid):
         """Recalculate land values based on surroundings and crime."""
-        for x in range(grid.width):
-            for y in range(grid.height):
-                tile = grid.tiles[x][y]
-                
-                # Start with base value
-                base_value = 50
-                
-                # Add modifiers from nearby tiles
-                modifier = self._calculate_neighbor_modifier(grid, x, y)
-                
-                # Crime reduces land value significantly
-                crime_penalty = tile.crime_level * 40
-                
-                # Calculate final value
-                final_value = base_value + modifier - crime_penalty
-                tile.land_value = max(0, min(100, int(final_value)))
-    
-    def _calculate_neighbor_modifier(self, grid, x, y):
-        """Calculate value modifier from neighboring tiles."""
-        total_modifier = 0.0
+        for _ in self.update_steps(grid):
+            pass
+    
+    def update_steps(self, grid):
+        """
+        Generator form of update() that yields after each chunk it writes,
+        so a scheduler can spread the work over several frames.
+        """
+        changes = grid.journal.consume('land_value', CHANGE_TYPE)
+        if self.modifiers is None or changes.full:
+            self._rebuild_modifiers(grid)
+        elif changes:
+            self._update_modifiers(grid, changes)
         
-        # Check tiles in a small radius
-        radius = 4
-        for dx in range(-radius, radius + 1):
-            for dy in range(-radius, radius + 1):
-                if dx == 0 and dy == 0:
-                    continue
-                    
-                nx, ny = x + dx, y + dy
-                if 0 <= nx < grid.width and 0 <= ny < grid.height:
-                    neighbor = grid.tiles[nx][ny]
-                    modifier = VALUE_MODIFIERS.get(neighbor.type, 0)
-                    
-                    if modifier != 0:
-                        # Distance-based falloff
-                        dist = max(1, ((dx ** 2) + (dy ** 2)) ** 0.5)
-                        total_modifier += modifier / dist
+        # Values only differ from the base inside allocated chunks or next to modifiers
+        for key in set(grid.chunks) | set(self.modifiers.chunks):
+            x0, y0, x1, y1 = grid.chunk_bounds(key)
+            modifiers = self.modifiers.chunk(key)
+            if modifiers is None:
+                modifiers = np.zeros((x1 - x0, y1 - y0))
+            chunk = grid.chunks.get(key)
+            crime_levels = chunk.crime_level if chunk is not None else 0.0
+            land_values = self._land_values(modifiers, crime_levels)
+            
+            if chunk is None:
+                if (land_values == 50).all():
+                    continue  # Leave plain grass unallocated
+                chunk = grid.ensure_chunk(x0, y0)
+            grid.record_chunk_changes(CHANGE_LAND_VALUE, chunk, chunk.land_value != land_values)
+            chunk.land_value[:] = land_values
+            yield
+    
+    def _rebuild_modifiers(self, grid):
+        """Sum neighbor modifiers for the whole map."""
+        self.modifiers = ChunkedField(grid.width, grid.height)
+        targets = set()
+        for chunk in grid.iter_chunks():
+            if VALUE_MODIFIER_TABLE[chunk.type_code].any():
+                targets.add((chunk.cx, chunk.cy))
+                targets.update(grid.neighbor_chunk_keys(chunk))
+        if self.pool is None:
+            for x0, y0, x1, y1, keys in chunk_blocks(grid, targets):
+                self.modifiers.assign(x0, y0, self._sum_modifiers(grid, x0, y0, x1, y1))
+            return
+        
+        # Blocks without modifiers sum to zero, which is what the field starts at
+        windows = []
+        for x0, y0, x1, y1, keys in chunk_blocks(grid, targets):
+            padded = self._modifier_window(grid, x0, y0, x1, y1)
+            if padded is not None:
+                windows.append((x0, y0, padded))
+        radius = self.VALUE_RADIUS
+        sums = self.pool.map_windows(falloff_sum, [(y0, padded) for _, y0, padded in windows],
+                                     radius, radius, False)
+        for (x0, y0, _), values in zip(windows, sums):
+            self.modifiers.assign(x0, y0, values)
+    
+    def _update_modifiers(self, grid, changes):
+        """Re-sum neighbor modifiers within VALUE_RADIUS of the tiles whose type changed."""
+        radius = self.VALUE_RADIUS
+        xs, ys = changes.positions()
+        for key, lx, ly, index in grid.split_by_chunk(xs, ys):
+            # One window per chunk around that chunk's changed tiles
+            x0, y0, _, _ = grid.chunk_bounds(key)
+            x0, y0, x1, y1 = (max(0, x0 + int(lx.min()) - radius),
+                              max(0, y0 + int(ly.min()) - radius),
+                              min(grid.width, x0 + int(lx.max()) + radius + 1),
+                              min(grid.height, y0 + int(ly.max()) + radius + 1))
+            self.modifiers.assign(x0, y0, self._sum_modifiers(grid, x0, y0, x1, y1))
+    
+    def _sum_modifiers(self, grid, x0, y0, x1, y1):
+        """Return the modifiers from nearby tiles, with distance-based falloff, for a rectangle."""
+        padded = self._modifier_window(grid, x0, y0, x1, y1)
+        if padded is None:
+            return np.zeros((x1 - x0, y1 - y0))
+        return falloff_sum(padded, self.VALUE_RADIUS, include_center=False)
+    
+    def _modifier_window(self, grid, x0, y0, x1, y1):
+        """Return the tile modifiers of a rectangle padded by VALUE_RADIUS, or None if all are zero."""
+        radius = self.VALUE_RADIUS
+        tile_modifiers = VALUE_MODIFIER_TABLE[grid.window('type_code', x0 - radius, y0 - radius,
+                                                          x1 + radius, y1 + radius)]
+        if not tile_modifiers.any():
+            return None
+        return tile_modifiers.astype(float)
+    
+    def _land_values(self, modifiers, crime_levels):
+        """Combine the base value, neighbor modifiers and crime penalty into 0-100 values."""
+        # Crime reduces land value significantly
+        crime_penalty = crime_levels * 40
         
-        return total_modifier
+        # Same float steps and int() truncation as the old per-tile code
+        final_values = 50 + modifiers - crime_penalty
+        return np.clip(np.trunc(final_values), 0, 100).astype(np.uint8)
@@ -0,0 +1,111 @@
+"""
+Multi-process strip kernels for SimCity Clone.
+
+Crime and land value sum every tile's neighborhood over blocks of chunks
+(see kernels.chunk_blocks). On huge maps StripPool computes those blocks in
+worker processes: the map is cut into horizontal strips of whole block rows,
+each block's source window (with a halo as wide as the influence radius) is
+copied into shared memory, and each process convolves one strip's blocks at
+a time. Blocks are computed exactly as the single-process code computes
+them, so results are identical. Power, fire and the per-chunk systems stay
+in the main process.
+"""
+
+import os
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import resource_tracker, shared_memory
+
+import numpy as np
+
+from engine.grid import CHUNK_SIZE
+from engine.kernels import BLOCK_CHUNKS
+
+# Tile rows per strip: one row of convolution blocks
+STRIP_ROWS = BLOCK_CHUNKS * CHUNK_SIZE
+
+
+class StripPool:
+    """
+    A pool of worker processes that run block kernels strip by strip.
+
+    Processes are started up front, so create the pool before starting
+    other threads (fork copies only the calling thread).
+    """
+
+    def __init__(self, processes=None):
+        self.processes = processes or os.cpu_count() or 1
+        # Workers must share our resource tracker; one of their own would
+        # report the blocks they open as leaked when they exit
+        resource_tracker.ensure_running()
+        self.executor = ProcessPoolExecutor(self.processes)
+        # Start the processes now rather than on the first tick
+        list(self.executor.map(int, range(self.processes)))
+
+    def close(self):
+        self.executor.shutdown()
+
+    def map_windows(self, function, windows, border, *args):
+        """
+        Return [function(padded, *args) for y0, padded in windows].
+
+        Each padded window has `border` halo cells on every side and its
+        interior starts at tile row y0; results have the interior's shape.
+        Windows in the same strip are computed by the same process.
+        """
+        if not windows:
+            return []
+        strips = {}
+        for index, (y0, _) in enumerate(windows):
+            strips.setdefault(y0 // STRIP_ROWS, []).append(index)
+        if len(strips) == 1:
+            # Nothing to split; shared memory would only add copies
+            return [function(padded, *args) for _, padded in windows]
+
+        # Lay every window, and every result, end to end in one buffer each
+        in_offsets, out_offsets, out_shapes = [], [], []
+        in_size = out_size = 0
+        for _, padded in windows:
+            out_shape = (padded.shape[0] - 2 * border, padded.shape[1] - 2 * border)
+            in_offsets.append(in_size)
+            out_offsets.append(out_size)
+            out_shapes.append(out_shape)
+            in_size += padded.size * 8
+            out_size += out_shape[0] * out_shape[1] * 8
+
+        source = shared_memory.SharedMemory(create=True, size=in_size)
+        target = shared_memory.SharedMemory(create=True, size=out_size)
+        try:
+            for (_, padded), offset in zip(windows, in_offsets):
+                np.ndarray(padded.shape, dtype=float, buffer=source.buf, offset=offset)[:] = padded
+            futures = [
+                self.executor.submit(_run_strip, function, args, source.name, target.name,
+                                     [(in_offsets[i], windows[i][1].shape, out_offsets[i], out_shapes[i])
+                                      for i in indices])
+                for indices in strips.values()]
+            for future in futures:
+                future.result()
+            return [np.ndarray(shape, dtype=float, buffer=target.buf, offset=offset).copy()
+                    for offset, shape in zip(out_offsets, out_shapes)]
+        finally:
+            source.close()
+            source.unlink()
+            target.close()
+            target.unlink()
+
+
+def _run_strip(function, args, source_name, target_name, entries):
+    """Worker side of map_windows: run function over one strip's windows in shared memory."""
+    source = shared_memory.SharedMemory(name=source_name)
+    target = shared_memory.SharedMemory(name=target_name)
+    try:
+        for entry in entries:
+            _run_window(function, args, source, target, *entry)
+    finally:
+        source.close()
+        target.close()
+
+
+def _run_window(function, args, source, target, in_offset, in_shape, out_offset, out_shape):
+    padded = np.ndarray(in_shape, dtype=float, buffer=source.buf, offset=in_offset)
+    result = np.ndarray(out_shape, dtype=float, buffer=target.buf, offset=out_offset)
+    result[:] = function(padded, *args)
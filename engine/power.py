@@ -0,0 +1,384 @@
+"""
+Power system for SimCity Clone.
+Tracks which tiles are connected to a power plant.
+"""
+
+from collections import deque
+
+import numpy as np
+
+from engine.grid import CHUNK_SIZE, CONDUCTS_POWER, POWER_PLANT, ROAD
+from engine.journal import CHANGE_POWER, CHANGE_TYPE
+
+NEIGHBORS = ((-1, 0), (1, 0), (0, -1), (0, 1))
+
+
+def _conducts(chunk):
+    """Power conductors: power_line (overlay), power_plant, and RCI zones."""
+    return chunk.has_power_line | CONDUCTS_POWER[chunk.type_code]
+
+
+class PowerNetwork:
+    """
+    Connected components of the conducting tiles, kept as a union-find forest.
+
+    Adding a conductor unions it with its neighbors; removing one relabels
+    only the component it belonged to. Each root keeps its member list and
+    the number of power plants in it, and a component is live (powered)
+    while it contains at least one plant.
+    """
+
+    def __init__(self):
+        self.parent = {}  # position -> parent position
+        self.members = {}  # root -> positions in the component
+        self.plants = {}  # root -> number of power plants in the component
+        self.plant_tiles = set()
+
+    @classmethod
+    def build(cls, conductors, plant_tiles):
+        """Label the components of a set of conductors from scratch."""
+        network = cls()
+        network.plant_tiles = set(plant_tiles) & conductors
+        unvisited = set(conductors)
+        while unvisited:
+            network._label(unvisited.pop(), unvisited)
+        return network
+
+    def __contains__(self, pos):
+        return pos in self.parent
+
+    def find(self, pos):
+        parent = self.parent
+        while parent[pos] != pos:
+            parent[pos] = parent[parent[pos]]  # Path halving
+            pos = parent[pos]
+        return pos
+
+    def is_live(self, pos):
+        """True if pos is a conductor connected to a power plant."""
+        return pos in self.parent and self.plants[self.find(pos)] > 0
+
+    def add(self, pos, is_plant):
+        """Add a conductor and merge it with the components around it."""
+        self.parent[pos] = pos
+        self.members[pos] = [pos]
+        self.plants[pos] = 0
+        self.set_plant(pos, is_plant)
+        x, y = pos
+        for dx, dy in NEIGHBORS:
+            neighbor = (x + dx, y + dy)
+            if neighbor in self.parent:
+                self.union(pos, neighbor)
+
+    def set_plant(self, pos, is_plant):
+        """Record whether the conductor at pos is a power plant."""
+        if is_plant == (pos in self.plant_tiles):
+            return
+        root = self.find(pos)
+        if is_plant:
+            self.plant_tiles.add(pos)
+            self.plants[root] += 1
+        else:
+            self.plant_tiles.discard(pos)
+            self.plants[root] -= 1
+
+    def union(self, a, b):
+        """Merge the components of a and b (smaller into larger) and return the root."""
+        root_a, root_b = self.find(a), self.find(b)
+        if root_a == root_b:
+            return root_a
+        if len(self.members[root_a]) < len(self.members[root_b]):
+            root_a, root_b = root_b, root_a
+        self.parent[root_b] = root_a
+        self.members[root_a].extend(self.members.pop(root_b))
+        self.plants[root_a] += self.plants.pop(root_b)
+        return root_a
+
+    def remove(self, positions):
+        """
+        Remove conductors and relabel the components they split.
+
+        Returns the roots of the resulting pieces.
+        """
+        removed = set(positions)
+        roots = {self.find(pos) for pos in removed}
+        self.plant_tiles -= removed
+        pieces = []
+        for root in roots:
+            members = self.members.pop(root)
+            del self.plants[root]
+            for pos in members:
+                del self.parent[pos]
+            remaining = set(members) - removed
+            while remaining:
+                pieces.append(self._label(remaining.pop(), remaining))
+        return pieces
+
+    def _label(self, start, unvisited):
+        """Make start the root of everything reachable from it through unvisited."""
+        members = [start]
+        plants = 1 if start in self.plant_tiles else 0
+        self.parent[start] = start
+        queue = deque(members)
+        while queue:
+            x, y = queue.popleft()
+            for dx, dy in NEIGHBORS:
+                neighbor = (x + dx, y + dy)
+                if neighbor in unvisited:
+                    unvisited.discard(neighbor)
+                    self.parent[neighbor] = start
+                    members.append(neighbor)
+                    queue.append(neighbor)
+                    if neighbor in self.plant_tiles:
+                        plants += 1
+        self.members[start] = members
+        self.plants[start] = plants
+        return start
+
+
+def _pack_lines(mask):
+    """Pack each row mask[i, :] of a boolean array into a Python int (bit j = column j)."""
+    packed = np.packbits(mask, axis=1, bitorder='little')
+    return [int.from_bytes(line.tobytes(), 'little') for line in packed]
+
+
+def _unpack_lines(lines, width):
+    """Inverse of _pack_lines."""
+    nbytes = (width + 7) // 8
+    data = b''.join(line.to_bytes(nbytes, 'little') for line in lines)
+    bits = np.unpackbits(np.frombuffer(data, dtype=np.uint8).reshape(len(lines), nbytes),
+                         axis=1, bitorder='little')
+    return bits[:, :width].astype(bool)
+
+
+def _fill_runs(mask, seeds, width):
+    """Return the runs of set bits in mask that contain a seed bit (seeds must be in mask)."""
+    # Upward: adding a seed carries through the rest of its run
+    rest = mask ^ seeds
+    up = mask & (((rest + (seeds << 1)) ^ rest) | seeds)
+    # Downward: log-step occluded fill
+    down, through, shift = seeds, mask, 1
+    while shift < width:
+        down |= through & (down >> shift)
+        through &= through >> shift
+        shift <<= 1
+    return up | down
+
+
+def flood_lines(conductors, seeds, width):
+    """
+    Flood seeds through 4-connected conductors, both given as packed lines.
+
+    Each line fills its seeded runs in one go, then sweeps down and up the
+    lines pass the flood across until nothing changes. Returns the packed
+    lines of every conductor connected to a seed.
+    """
+    flooded = [_fill_runs(mask, seed & mask, width) if seed & mask else 0
+               for mask, seed in zip(conductors, seeds)]
+    count = len(conductors)
+    changed = True
+    while changed:
+        changed = False
+        for order in (range(count), range(count - 1, -1, -1)):
+            previous = 0
+            for i in order:
+                grow = previous & conductors[i] & ~flooded[i]
+                if grow:
+                    flooded[i] = _fill_runs(conductors[i], flooded[i] | grow, width)
+                    changed = True
+                previous = flooded[i]
+    return flooded
+
+
+class PowerSystem:
+    """
+    Powers tiles connected to a power plant.
+
+    Power flows through conductors (power lines, plants and RCI zones); roads
+    next to a powered conductor receive power but don't pass it on.
+
+    A full recompute floods packed bitsets of the map. The conductor network
+    is then built the first time an edit needs it and patched from the change
+    journal, so an update with no edits does nothing and an edit only
+    rewrites is_powered for the components it touched.
+    """
+
+    # More changed tiles than this in one update triggers a full recompute
+    FULL_RECOMPUTE_CHANGES = 4096
+
+    def __init__(self):
+        self.network = None  # PowerNetwork, built when the first edit needs it
+        self.initialized = False
+
+    def update(self, grid):
+        changes = grid.journal.consume('power', CHANGE_TYPE)
+        if not self.initialized or changes.full:
+            self._recompute(grid)
+            return
+        if not changes:
+            return
+
+        xs, ys = changes.positions()
+        changed = list(zip(xs.tolist(), ys.tolist()))
+        if len(changed) > self.FULL_RECOMPUTE_CHANGES:
+            self._recompute(grid)
+        elif self.network is None:
+            # The network is built from the grid as it is now, after the edits
+            self.network = PowerNetwork.build(set(grid.find(_conducts)),
+                                              grid.buildings.positions(POWER_PLANT))
+            self._apply_changes(grid, changed, rebuilt=True)
+        else:
+            self._apply_changes(grid, changed)
+
+    def _recompute(self, grid):
+        """Recompute is_powered for the whole map with a bit-parallel flood fill."""
+        self.initialized = True
+        self.network = None
+        if not grid.chunks:
+            return
+
+        # Dense masks over the bounding box of the allocated chunks
+        keys = list(grid.chunks)
+        x0 = min(key[0] for key in keys) * CHUNK_SIZE
+        y0 = min(key[1] for key in keys) * CHUNK_SIZE
+        x1 = min(grid.width, (max(key[0] for key in keys) + 1) * CHUNK_SIZE)
+        y1 = min(grid.height, (max(key[1] for key in keys) + 1) * CHUNK_SIZE)
+        conducts = np.zeros((x1 - x0, y1 - y0), dtype=bool)
+        roads = np.zeros_like(conducts)
+        plants = np.zeros_like(conducts)
+        for chunk in grid.iter_chunks():
+            area = (slice(chunk.x0 - x0, chunk.x0 - x0 + chunk.width),
+                    slice(chunk.y0 - y0, chunk.y0 - y0 + chunk.height))
+            conducts[area] = _conducts(chunk)
+            roads[area] = chunk.type_code == ROAD
+            plants[area] = chunk.type_code == POWER_PLANT
+        if not plants.any():
+            self._store_power(grid, np.zeros_like(conducts), x0, y0)
+            return
+
+        width = y1 - y0
+        flooded = flood_lines(_pack_lines(conducts), _pack_lines(plants), width)
+
+        # Roads receive power from a powered neighbor but don't propagate it
+        fed = []
+        for i, line in enumerate(_pack_lines(roads & ~conducts)):
+            if line:
+                around = flooded[i] << 1 | flooded[i] >> 1
+                if i > 0:
+                    around |= flooded[i - 1]
+                if i + 1 < len(flooded):
+                    around |= flooded[i + 1]
+                line &= around
+            fed.append(line)
+
+        powered = _unpack_lines([a | b for a, b in zip(flooded, fed)], width)
+        self._store_power(grid, powered, x0, y0)
+
+    def _store_power(self, grid, powered, x0, y0):
+        """Copy a dense is_powered mask whose [0, 0] is (x0, y0) into the chunks, journaling flips."""
+        for chunk in grid.iter_chunks():
+            new = powered[chunk.x0 - x0:chunk.x0 - x0 + chunk.width,
+                          chunk.y0 - y0:chunk.y0 - y0 + chunk.height]
+            grid.record_chunk_changes(CHANGE_POWER, chunk, chunk.is_powered != new)
+            chunk.is_powered[:] = new
+
+    def _apply_changes(self, grid, changed, rebuilt=False):
+        """
+        Patch the network and is_powered after edits to the given tiles.
+
+        With rebuilt, the network already reflects the edits, so every
+        component next to them is rewritten instead.
+        """
+        network = self.network
+        changed_set = set(changed)
+        states = {pos: self._tile_state(grid, pos) for pos in changed}
+        if rebuilt:
+            rewrite = set()
+            for x, y in changed:
+                for neighbor in [(x, y)] + [(x + dx, y + dy) for dx, dy in NEIGHBORS]:
+                    if neighbor in network:
+                        rewrite.add(network.find(neighbor))
+            self._write_power(grid, changed, states, rewrite)
+            return
+
+        removed = [pos for pos in changed if pos in network and not states[pos][0]]
+        if removed:
+            network.remove(removed)
+
+        # Every component that additions or plant changes can touch now holds
+        # tiles with a consistent old is_powered; keep one unchanged tile of
+        # each to tell afterwards whether its liveness flipped
+        representatives = []
+        roots = set()
+        for x, y in changed:
+            for neighbor in [(x, y)] + [(x + dx, y + dy) for dx, dy in NEIGHBORS]:
+                if neighbor in network:
+                    root = network.find(neighbor)
+                    if root not in roots:
+                        roots.add(root)
+                        representatives.extend(
+                            [pos for pos in network.members[root] if pos not in changed_set][:1])
+
+        force = []
+        for pos in changed:
+            conducts, is_plant, _ = states[pos]
+            if pos in network and conducts and is_plant != (pos in network.plant_tiles):
+                network.set_plant(pos, is_plant)
+                force.append(pos)
+        for pos in changed:
+            conducts, is_plant, _ = states[pos]
+            if conducts and pos not in network:
+                network.add(pos, is_plant)
+
+        # Rewrite the components whose liveness changed
+        rewrite = {network.find(pos) for pos in force}
+        for pos in representatives:
+            if self._is_powered(grid, pos) != network.is_live(pos):
+                rewrite.add(network.find(pos))
+        self._write_power(grid, changed, states, rewrite)
+
+    def _write_power(self, grid, changed, states, rewrite):
+        """Write is_powered for the edited tiles, the rewrite components and the roads around them."""
+        network = self.network
+        touched = set(changed)
+        powered, unpowered = [], []
+        for root in rewrite:
+            members = network.members[root]
+            (powered if network.plants[root] else unpowered).extend(members)
+            touched.update(members)
+        for pos in changed:
+            if pos in network:
+                (powered if network.is_live(pos) else unpowered).append(pos)
+            elif not states[pos][2]:
+                unpowered.append(pos)
+
+        # Roads next to anything that changed get re-checked
+        candidates = set()
+        for x, y in touched:
+            candidates.add((x, y))
+            candidates.update((x + dx, y + dy) for dx, dy in NEIGHBORS)
+        for x, y in candidates:
+            if (x, y) in network or not (0 <= x < grid.width and 0 <= y < grid.height):
+                continue
+            chunk = grid.chunk_at(x, y)
+            if chunk is None or chunk.type_code[x - chunk.x0, y - chunk.y0] != ROAD:
+                continue
+            fed = any(network.is_live((x + dx, y + dy)) for dx, dy in NEIGHBORS)
+            (powered if fed else unpowered).append((x, y))
+
+        grid.fill('is_powered', powered, True, CHANGE_POWER)
+        grid.fill('is_powered', unpowered, False, CHANGE_POWER)
+
+    def _tile_state(self, grid, pos):
+        """Return (conducts, is_plant, is_road) for a tile."""
+        chunk = grid.chunk_at(*pos)
+        if chunk is None:
+            return False, False, False
+        lx, ly = pos[0] - chunk.x0, pos[1] - chunk.y0
+        code = chunk.type_code[lx, ly]
+        conducts = bool(chunk.has_power_line[lx, ly] or CONDUCTS_POWER[code])
+        return conducts, code == POWER_PLANT, code == ROAD and not conducts
+
+    def _is_powered(self, grid, pos):
+        chunk = grid.chunk_at(*pos)
+        return chunk is not None and bool(chunk.is_powered[pos[0] - chunk.x0, pos[1] - chunk.y0])
@@ -1,5 +1,6 @@
 import pygame
 import random
+from engine.grid import TILE_TYPES, INDUSTRIAL, POWER_PLANT
 
 # Colors
 COLOR_GRASS = (139, 90, 43)  # Brown - to differentiate from residential green
@@ -15,6 +16,20 @@ COLOR_BURNED = (40, 40, 40)  # v0.4.0: Charred rubble
 COLOR_HIGHLIGHT = (255, 255, 255)
 COLOR_GRID_LINES = (50, 50, 50)
 
+# Base color per type code
+TYPE_COLORS = [
+    {
+        'road': COLOR_ROAD,
+        'residential': COLOR_RESIDENTIAL,
+        'commercial': COLOR_COMMERCIAL,
+        'industrial': COLOR_INDUSTRIAL,
+        'power_plant': COLOR_POWER_PLANT,
+        'police': COLOR_POLICE,
+        'fire_station': COLOR_FIRE_STATION,  # v0.4.0
+    }.get(name, COLOR_GRASS)
+    for name in TILE_TYPES
+]
+
 TILE_SIZE = 32
 
 class Renderer:
@@ -36,7 +51,13 @@ class Renderer:
         world_y = (screen_y + self.camera_y) // TILE_SIZE
         return int(world_x), int(world_y)
 
-    def draw(self, overlay_mode=None):
+    def draw(self, overlay_mode=None, fire_coverage=None):
+        """
+        Draw the visible part of the map.
+
+        fire_coverage is the fire system's coverage layer; the fire overlay
+        shades the tiles it covers.
+        """
         self.screen.fill((0, 0, 0)) # Clear with black
 
         # Determine visible range to optimize rendering
@@ -53,14 +74,7 @@ class Renderer:
                 sx, sy = self.world_to_screen(x, y)
                 rect = (sx, sy, TILE_SIZE, TILE_SIZE)
 
-                base_color = COLOR_GRASS
-                if tile.type == 'road': base_color = COLOR_ROAD
-                elif tile.type == 'residential': base_color = COLOR_RESIDENTIAL
-                elif tile.type == 'commercial': base_color = COLOR_COMMERCIAL
-                elif tile.type == 'industrial': base_color = COLOR_INDUSTRIAL
-                elif tile.type == 'power_plant': base_color = COLOR_POWER_PLANT
-                elif tile.type == 'police': base_color = COLOR_POLICE
-                elif tile.type == 'fire_station': base_color = COLOR_FIRE_STATION  # v0.4.0
+                base_color = TYPE_COLORS[tile.type_code]
                 
                 # v0.4.0: Burned tiles are charred rubble
                 if tile.is_burned:
@@ -69,7 +83,7 @@ class Renderer:
                 # Adjust color based on population (Darker = Empty, Brighter = Full)
                 final_color = list(base_color)
                 
-                if tile.type in ['residential', 'commercial', 'industrial']:
+                if tile.needs_power:
                     pop_factor = 0.5 + (tile.population / 20.0) # 0.5 to 1.0
                     final_color = [c * pop_factor for c in final_color]
                     
@@ -110,13 +124,13 @@ class Renderer:
                 
                 # Draw data overlay if active
                 if overlay_mode:
-                    self._draw_overlay_tile(tile, sx, sy, overlay_mode)
+                    self._draw_overlay_tile(tile, sx, sy, overlay_mode, fire_coverage)
                 
                 # v0.4.0: Draw fire effect on burning tiles
                 if tile.is_on_fire:
                     self._draw_fire_effect(tile, sx, sy)
 
-    def _draw_overlay_tile(self, tile, sx, sy, overlay_mode):
+    def _draw_overlay_tile(self, tile, sx, sy, overlay_mode, fire_coverage=None):
         """Draw data overlay on a single tile."""
         overlay_surface = pygame.Surface((TILE_SIZE, TILE_SIZE), pygame.SRCALPHA)
         
@@ -140,18 +154,26 @@ class Renderer:
                 overlay_surface.fill((255, 255, 0, 100))  # Yellow for powered
             elif tile.needs_power:
                 overlay_surface.fill((255, 0, 0, 150))  # Red for needs power but unpowered
+        elif overlay_mode == 'road_access':
+            if tile.needs_power:
+                if tile.has_road_access:
+                    overlay_surface.fill((0, 200, 255, 80))  # Blue for connected zones
+                else:
+                    overlay_surface.fill((255, 0, 255, 150))  # Magenta for zones without a road
         elif overlay_mode == 'fire':  # v0.4.0: Fire overlay
             if tile.is_on_fire:
                 overlay_surface.fill((255, 100, 0, 200))  # Bright orange for active fire
             elif tile.is_burned:
                 overlay_surface.fill((80, 80, 80, 150))  # Gray for burned
-            elif tile.type in ['industrial', 'power_plant']:
+            elif tile.type_code in (INDUSTRIAL, POWER_PLANT):
                 # Fire risk - industrial/power plants can ignite
                 overlay_surface.fill((255, 150, 0, 80))  # Light orange for fire risk
             elif tile.building_health < 1.0:
                 # Damaged buildings
                 damage = 1.0 - tile.building_health
                 overlay_surface.fill((255, 0, 0, int(damage * 150)))
+            elif fire_coverage is not None and fire_coverage.get(tile.x, tile.y) > 0:
+                overlay_surface.fill((0, 150, 255, 50))  # Faint blue for fire station coverage
         
         self.screen.blit(overlay_surface, (sx, sy))
     
@@ -0,0 +1,106 @@
+"""
+Time-sliced simulation scheduler for SimCity Clone.
+
+A simulation tick runs every system once, which on a large map takes longer
+than a frame. Instead of running them all on the frame the tick starts, the
+scheduler queues them and runs as many as fit in a per-frame time budget,
+so the work is spread over the frames until the next tick. Systems with an
+update_steps() generator are resumed chunk by chunk, so even one large
+system does not stall a frame.
+"""
+
+import inspect
+import time
+from collections import deque
+
+
+class Scheduler:
+    """
+    Runs the jobs of each simulation tick across frames.
+
+    Jobs run in the order they were added. A job with frequency `every`
+    runs on every `every`-th tick only, so slow-changing systems (land
+    value) can run less often than fast ones (fire). A job that returns a
+    generator is resumed one step at a time until it is exhausted.
+    """
+
+    def __init__(self, budget_ms=4.0):
+        self.budget_ms = budget_ms  # Time per frame spent on queued jobs
+        self.jobs = []  # [name, job, every] in run order
+        self.pending = deque()  # (name, job) still to run this tick
+        self.steps = None  # Generator of the job at the head of pending, once started
+        self.tick = 0
+        self.steps_run = 0  # Job steps run since the current tick started
+        self.timings = {}  # name -> ms the job took (all steps) the last time it ran
+        self.totals = {}  # name -> ms the job took over all ticks so far
+
+    def add(self, name, job, every=1):
+        """Add a job (a callable without arguments) that runs every `every` ticks."""
+        self.jobs.append([name, job, every])
+
+    def set_frequency(self, name, every):
+        """Change how many ticks apart a job runs."""
+        for entry in self.jobs:
+            if entry[0] == name:
+                entry[2] = every
+                return
+        raise KeyError(name)
+
+    @property
+    def busy(self):
+        """True while jobs of the current tick are still queued."""
+        return bool(self.pending)
+
+    def start_tick(self):
+        """
+        Queue the jobs due this tick.
+
+        Jobs left over from the previous tick run first, all at once, so
+        systems always see the previous tick completed.
+        """
+        self.finish()
+        self.tick += 1
+        self.steps_run = 0
+        for name, job, every in self.jobs:
+            if self.tick % every == 0:
+                self.pending.append((name, job))
+
+    def run(self, budget_ms=None):
+        """
+        Run queued jobs until the frame's budget is used up.
+
+        At least one job (or job step) runs per call, so a tick always
+        completes even if a single step takes longer than the budget.
+        """
+        budget = (self.budget_ms if budget_ms is None else budget_ms) / 1000.0
+        start = time.perf_counter()
+        while self.pending:
+            self.step()
+            if time.perf_counter() - start >= budget:
+                break
+
+    def finish(self):
+        """Run every queued job now."""
+        while self.pending:
+            self.step()
+
+    def step(self):
+        """Run the next job, or the next step of the job in progress."""
+        name, job = self.pending[0]
+        start = time.perf_counter()
+        if self.steps is None:
+            self.timings[name] = 0.0
+            result = job()
+            if inspect.isgenerator(result):
+                self.steps = result
+        if self.steps is not None:
+            try:
+                next(self.steps)
+            except StopIteration:
+                self.steps = None
+        if self.steps is None:
+            self.pending.popleft()
+        self.steps_run += 1
+        elapsed = (time.perf_counter() - start) * 1000.0
+        self.timings[name] += elapsed
+        self.totals[name] = self.totals.get(name, 0.0) + elapsed
@@ -0,0 +1,352 @@
+"""
+Headless simulation core for SimCity Clone.
+
+Simulation owns the grid, the systems and the economy and knows how to
+apply player commands, run ticks and save or load a city. It does not
+import pygame, so it can run on servers and in batch jobs; Game wraps it
+with a window, input and drawing.
+"""
+
+import hashlib
+import json
+from collections import deque
+
+import numpy as np
+
+from engine.grid import Grid, LAYERS, GRASS, RESIDENTIAL, COMMERCIAL, INDUSTRIAL
+from engine.systems import GrowthSystem, DemandSystem
+from engine.power import PowerSystem
+from engine.economy import EconomySystem
+from engine.crime import CrimeSystem
+from engine.land_value import LandValueSystem
+from engine.fire import FireSystem
+from engine.decay import DecaySystem
+from engine.scheduler import Scheduler
+from engine.parallel import StripPool
+from engine.command_log import CommandLog
+
+SAVE_VERSION = '0.4.0'
+
+
+class Simulation:
+    """
+    A city and the systems that run it.
+
+    run_tick() runs one whole tick; callers that want to spread a tick over
+    frames drive `scheduler` themselves (start_tick() and run()). With
+    processes > 1, crime and land value convolve strips of the map in that
+    many worker processes; call close() when done to stop them.
+
+    All randomness comes from one generator seeded with `seed` (a random
+    seed if None), reseeded whenever a city is loaded, so the same city,
+    seed and commands always give the same result. start_recording() logs
+    the commands for replay().
+    """
+
+    def __init__(self, width=100, height=100, seed=None, processes=None):
+        self.grid = Grid(width, height)  # Chunks are allocated as the city grows
+        self.pool = StripPool(processes) if processes and processes > 1 else None
+        self.seed = seed if seed is not None else np.random.SeedSequence().entropy
+        self._create_systems()
+        self.economy = EconomySystem()
+        self.last_income = 0  # Track income for display
+        self.collapses = deque()  # Collapsed building positions not announced yet
+        self.log = None  # CommandLog while recording
+
+        # Systems in tick order; `every` makes a system skip ticks. Power also
+        # updates right after every command.
+        self.scheduler = Scheduler()
+        self.scheduler.add('power', self.update_power)
+        self.scheduler.add('growth', lambda: self.growth_system.update_steps(self.grid))
+        self.scheduler.add('demand', lambda: self.demand_system.update(self.grid))
+        self.scheduler.add('crime', lambda: self.crime_system.update_steps(self.grid))
+        self.scheduler.add('land_value', lambda: self.land_value_system.update_steps(self.grid))
+        self.scheduler.add('fire', lambda: self.fire_system.update(self.grid))  # v0.4.0
+        self.scheduler.add('decay', self._update_decay)  # v0.4.0
+        self.scheduler.add('taxes', self._collect_taxes)
+        self.scheduler.add('upkeep', lambda: self.economy.deduct_upkeep(self.grid))
+
+    def _create_systems(self):
+        """Create the systems and the random generator they share, as for a new city."""
+        # Growth, fire ignition and fire spread draw from one generator
+        self.rng = np.random.default_rng(self.seed)
+
+        self.power_system = PowerSystem()
+        self.growth_system = GrowthSystem(self.rng)
+        self.demand_system = DemandSystem()
+        self.crime_system = CrimeSystem(self.pool)
+        self.land_value_system = LandValueSystem(self.pool)
+        self.fire_system = FireSystem(self.rng)  # v0.4.0
+        self.decay_system = DecaySystem()  # v0.4.0
+
+    def close(self):
+        """Stop the worker processes, if any."""
+        if self.pool is not None:
+            self.pool.close()
+            self.pool = None
+            self.crime_system.pool = self.land_value_system.pool = None
+
+    @property
+    def tick(self):
+        """Number of ticks started since the city was created or loaded."""
+        return self.scheduler.tick
+
+    def update_power(self):
+        """Bring is_powered up to date with the edits since the last call."""
+        self.power_system.update(self.grid)
+
+    def run_tick(self):
+        """Run one whole simulation tick now."""
+        self.scheduler.start_tick()
+        self.scheduler.finish()
+
+    def _update_decay(self):
+        """Run decay chunk by chunk and queue collapsed buildings for notification."""
+        for collapses in self.decay_system.update_steps(self.grid, self.economy):
+            self.collapses.extend(collapses)
+            yield
+
+    def _collect_taxes(self):
+        self.last_income = self.economy.collect_taxes(self.grid)
+
+    def apply_command(self, command):
+        """
+        Apply a player command to the city.
+
+        Commands are tuples: ('tile', tool, x, y) uses a tool on one tile;
+        ('zone', tool, min_x, min_y, max_x, max_y) fills a rectangle (zones)
+        or its perimeter (roads); ('budget', setting, direction) steps the
+        tax rate (by 1) or 'police' / 'fire' funding (by 10%) up or down.
+        """
+        if self.log is not None:
+            self.log.record(self.scheduler.tick, self.scheduler.steps_run, command)
+
+        kind = command[0]
+        if kind == 'tile':
+            tool, x, y = command[1:]
+            # Check if we can afford this
+            if not self.economy.can_afford(tool):
+                return  # Can't afford, do nothing
+
+            if tool == 'power_line':
+                if self.economy.deduct_cost(tool):
+                    self.grid.toggle_power_line(x, y)
+            else:
+                if self.economy.deduct_cost(tool):
+                    self.grid.set_tile_type(x, y, tool)
+        elif kind == 'zone':
+            tool, min_x, min_y, max_x, max_y = command[1:]
+            if tool == 'road':
+                # Place roads along the perimeter only
+                self._place_perimeter_with_cost(min_x, min_y, max_x, max_y, 'road')
+            else:
+                # Fill the entire rectangular area for RCI zones
+                for x in range(min_x, max_x + 1):
+                    for y in range(min_y, max_y + 1):
+                        if self.economy.can_afford(tool):
+                            if self.economy.deduct_cost(tool):
+                                self.grid.set_tile_type(x, y, tool)
+        elif kind == 'budget':
+            setting, direction = command[1:]
+            if setting == 'tax_rate':
+                self.economy.tax_rate = max(1, min(20, self.economy.tax_rate + direction))
+            else:
+                current = self.economy.service_funding[setting]
+                self.economy.service_funding[setting] = max(0.0, min(1.0, current + direction * 0.1))
+
+        # Power follows edits right away, so the overlay never lags placement
+        self.update_power()
+
+    def _place_perimeter_with_cost(self, min_x, min_y, max_x, max_y, tile_type):
+        """Place tiles along the perimeter with cost deduction."""
+        positions = []
+        # Top edge
+        for x in range(min_x, max_x + 1):
+            positions.append((x, min_y))
+        # Bottom edge (skip if same as top)
+        if max_y != min_y:
+            for x in range(min_x, max_x + 1):
+                positions.append((x, max_y))
+        # Left edge (excluding corners)
+        for y in range(min_y + 1, max_y):
+            positions.append((min_x, y))
+        # Right edge (excluding corners, skip if same as left)
+        if max_x != min_x:
+            for y in range(min_y + 1, max_y):
+                positions.append((max_x, y))
+
+        for x, y in positions:
+            if self.economy.can_afford(tile_type):
+                if self.economy.deduct_cost(tile_type):
+                    self.grid.set_tile_type(x, y, tile_type)
+
+    def to_dict(self):
+        """Serialize the city (grid and economy) for a save file."""
+        # Save between ticks, not halfway through one
+        self.scheduler.finish()
+
+        grid = self.grid
+        tiles_data = []
+        # Only save non-default tiles to reduce file size
+        non_default = lambda c: ((c.type_code != GRASS) | c.has_power_line | (c.population > 0) |
+                                 c.is_on_fire | c.is_burned | (c.building_health < 1.0))
+        for x, y in grid.find(non_default):
+            tile = grid.get_tile(x, y)
+            tiles_data.append({
+                'x': x,
+                'y': y,
+                'type': tile.type,
+                'has_power_line': tile.has_power_line,
+                'population': tile.population,
+                # v0.4.0: Fire state
+                'is_on_fire': tile.is_on_fire,
+                'fire_intensity': tile.fire_intensity,
+                'is_burned': tile.is_burned,
+                'building_health': tile.building_health,
+            })
+
+        return {
+            'version': SAVE_VERSION,
+            'grid': {
+                'width': grid.width,
+                'height': grid.height,
+                'tiles': tiles_data,
+            },
+            'economy': self.economy.to_dict(),
+        }
+
+    def load_dict(self, save_data):
+        """Replace the city with one read from a save file's data."""
+        # Don't leave the current tick's jobs to run on the loaded city
+        self.scheduler.finish()
+
+        # Reset grid, systems and tick count, so a loaded city always runs
+        # the same way for a given seed
+        self.grid = Grid(save_data['grid']['width'], save_data['grid']['height'])
+        self._create_systems()
+        self.scheduler.tick = 0
+        self.scheduler.steps_run = 0
+
+        # Restore tiles
+        for tile_data in save_data['grid']['tiles']:
+            x, y = tile_data['x'], tile_data['y']
+            tile = self.grid.get_tile(x, y)
+            if tile:
+                tile.type = tile_data['type']
+                tile.has_power_line = tile_data.get('has_power_line', False)
+                tile.population = tile_data.get('population', 0)
+                # v0.4.0: Fire state
+                tile.is_on_fire = tile_data.get('is_on_fire', False)
+                tile.fire_intensity = tile_data.get('fire_intensity', 0.0)
+                tile.is_burned = tile_data.get('is_burned', False)
+                tile.building_health = tile_data.get('building_health', 1.0)
+
+        # Restore economy
+        self.economy.from_dict(save_data.get('economy', {}))
+
+        # Run systems to update state
+        self.update_power()
+        self.demand_system.update(self.grid)
+
+        if self.log is not None:
+            # A load starts a new session
+            self.log = CommandLog(self.seed, save_data)
+
+    @classmethod
+    def from_file(cls, filepath, seed=None, processes=None):
+        """Create a simulation from a save file."""
+        with open(filepath, 'r') as f:
+            save_data = json.load(f)
+        simulation = cls(save_data['grid']['width'], save_data['grid']['height'], seed, processes)
+        simulation.load_dict(save_data)
+        return simulation
+
+    @classmethod
+    def from_log(cls, log, processes=None):
+        """Create a simulation at the start of a recorded session."""
+        start = log.start
+        simulation = cls(start['grid']['width'], start['grid']['height'], log.seed, processes)
+        simulation.load_dict(start)
+        return simulation
+
+    def start_recording(self):
+        """
+        Start a command log from the current city.
+
+        The city is reloaded from its own save data first, so the session
+        starts from a state that replay() can rebuild exactly.
+        """
+        save_data = self.to_dict()
+        self.load_dict(save_data)
+        self.log = CommandLog(self.seed, save_data)
+
+    def stop_recording(self):
+        """Stop logging commands and return the log, marked with where it ended."""
+        log, self.log = self.log, None
+        log.end = [self.scheduler.tick, self.scheduler.steps_run]
+        log.final_hash = self.state_hash()
+        return log
+
+    def replay(self, log):
+        """
+        Run a recorded session on a simulation created with from_log(log).
+
+        Ticks are run job step by job step so every command is applied at
+        exactly the point of the tick it was recorded at. Stops where the
+        recording stopped.
+        """
+        scheduler = self.scheduler
+        commands = deque(log.commands)
+        end = tuple(log.end)
+        while True:
+            position = (scheduler.tick, scheduler.steps_run)
+            while commands and tuple(commands[0][:2]) == position:
+                self.apply_command(tuple(commands.popleft()[2]))
+            if position >= end:
+                break
+            if scheduler.busy:
+                scheduler.step()
+            else:
+                scheduler.start_tick()
+        if commands:
+            raise ValueError(f"{len(commands)} commands were not reached by the replay")
+
+    def state_hash(self):
+        """Return a digest of the grid layers and the economy, for comparing runs."""
+        digest = hashlib.sha256()
+        for key in sorted(self.grid.chunks):
+            chunk = self.grid.chunks[key]
+            digest.update(repr(key).encode())
+            for name in LAYERS:
+                digest.update(getattr(chunk, name).tobytes())
+        digest.update(json.dumps(self.economy.to_dict(), sort_keys=True).encode())
+        return digest.hexdigest()
+
+    def save(self, filepath):
+        """Write the city to a save file (without camera position)."""
+        with open(filepath, 'w') as f:
+            json.dump(self.to_dict(), f, indent=2)
+
+    def summary(self):
+        """Return a JSON-friendly overview of the city's state."""
+        stats = self.grid.stats
+        land_values, crime = stats.histograms()
+        return {
+            'tick': self.tick,
+            'money': self.economy.money,
+            'last_income': self.last_income,
+            'population': stats.population(),
+            'residential': stats.population(RESIDENTIAL),
+            'commercial': stats.population(COMMERCIAL),
+            'industrial': stats.population(INDUSTRIAL),
+            'powered_population': sum(stats.powered_population(code)
+                                      for code in (RESIDENTIAL, COMMERCIAL, INDUSTRIAL)),
+            'demand': {
+                'residential': self.demand_system.residential,
+                'commercial': self.demand_system.commercial,
+                'industrial': self.demand_system.industrial,
+            },
+            'fires': self.fire_system.get_fire_count(),
+            'land_value_histogram': land_values.tolist(),
+            'crime_histogram': crime.tolist(),
+        }
@@ -1,83 +1,71 @@
-from collections import deque
-import random
+import numpy as np
+from engine.grid import RESIDENTIAL, COMMERCIAL, INDUSTRIAL, IS_ZONE
+from engine.journal import CHANGE_POPULATION
+from engine.power import PowerSystem  # Re-exported; power lives in engine.power
 
-class PowerSystem:
-    def update(self, grid):
-        # Reset power for all tiles
-        for x in range(grid.width):
-            for y in range(grid.height):
-                grid.tiles[x][y].is_powered = False
+class GrowthSystem:
+    """
+    Grows and shrinks zone populations.
 
-        # Find power sources
-        sources = []
-        for x in range(grid.width):
-            for y in range(grid.height):
-                if grid.tiles[x][y].type == 'power_plant':
-                    sources.append((x, y))
-                    grid.tiles[x][y].is_powered = True
+    1. Needs Power
+    2. Needs Road Access (adjacent to road)
+    3. Random chance to grow
 
-        # Propagate power (BFS) through power lines
-        # Assumption: Power travels through 'power_line' and 'power_plant'
-        # Zones get powered if they are adjacent to a powered tile? 
-        # Or do they need to be adjacent to a line/plant? 
-        # Let's say power flows through lines, and any building adjacent to a powered line gets power.
-        
-        queue = deque(sources)
-        visited = set(sources)
+    Each tick draws one random number per zone tile in a single batch from
+    rng, so a seeded generator gives reproducible growth.
+    """
 
-        while queue:
-            cx, cy = queue.popleft()
-            
-            # Check neighbors
-            for dx, dy in [(-1, 0), (1, 0), (0, -1), (0, 1)]:
-                nx, ny = cx + dx, cy + dy
-                if 0 <= nx < grid.width and 0 <= ny < grid.height:
-                    neighbor = grid.tiles[nx][ny]
-                    
-                    if (nx, ny) not in visited:
-                        # Power conductors: power_line (overlay), power_plant, and RCI zones
-                        if neighbor.has_power_line or neighbor.type in ['power_plant', 'residential', 'commercial', 'industrial']:
-                            neighbor.is_powered = True
-                            visited.add((nx, ny))
-                            queue.append((nx, ny))
-                        # Roads receive power but don't propagate it
-                        elif neighbor.type == 'road':
-                            neighbor.is_powered = True
+    GROW_CHANCE = 0.01              # Powered with road access
+    NO_ROAD_DECAY_CHANCE = 0.05     # Powered without road access
+    NO_POWER_DECAY_CHANCE = 0.1     # Unpowered
+    MAX_POPULATION = 10
 
+    def __init__(self, rng=None):
+        self.rng = rng if rng is not None else np.random.default_rng()
 
-class GrowthSystem:
     def update(self, grid):
-        # Very basic growth logic
-        # 1. Needs Power
-        # 2. Needs Road Access (adjacent to road)
-        # 3. Random chance to grow
-        
-        for x in range(grid.width):
-            for y in range(grid.height):
-                tile = grid.tiles[x][y]
-                if tile.type in ['residential', 'commercial', 'industrial']:
-                    if tile.is_powered:
-                        # Check for road adjacency
-                        has_road = False
-                        for dx, dy in [(-1, 0), (1, 0), (0, -1), (0, 1)]:
-                            nx, ny = x + dx, y + dy
-                            if 0 <= nx < grid.width and 0 <= ny < grid.height:
-                                if grid.tiles[nx][ny].type == 'road':
-                                    has_road = True
-                                    break
-                        
-                        if has_road:
-                            # Grow population
-                            if random.random() < 0.01: # 1% chance per tick
-                                tile.population = min(tile.population + 1, 10)
-                        else:
-                             # Decay if no road
-                             if random.random() < 0.05:
-                                 tile.population = max(tile.population - 1, 0)
-                    else:
-                        # Decay if no power
-                        if random.random() < 0.1:
-                            tile.population = max(tile.population - 1, 0)
+        for _ in self.update_steps(grid):
+            pass
+
+    def update_steps(self, grid):
+        """
+        Generator form of update() that yields after each chunk, so a
+        scheduler can spread the work over several frames.
+        """
+        # Zones per chunk, in a fixed chunk order so draws don't depend on allocation order
+        work = []
+        for key in sorted(grid.chunks):
+            chunk = grid.chunks[key]
+            zones = IS_ZONE[chunk.type_code]
+            if zones.any():
+                work.append((chunk, zones))
+        if not work:
+            return
+        draws = self.rng.random(sum(int(zones.sum()) for _, zones in work))
+
+        start = 0
+        for chunk, zones in work:
+            rolls = draws[start:start + int(zones.sum())]
+            start += len(rolls)
+
+            # Tiles rebuilt since the draws were made (between frames) keep their population
+            still_zones = IS_ZONE[chunk.type_code][zones]
+            powered = chunk.is_powered[zones]
+            served = powered & chunk.has_road_access[zones]
+
+            chance = np.where(served, self.GROW_CHANCE,
+                              np.where(powered, self.NO_ROAD_DECAY_CHANCE, self.NO_POWER_DECAY_CHANCE))
+            hit = (rolls < chance) & still_zones
+            population = chunk.population[zones]
+            new_population = np.where(hit & served, np.minimum(population + 1, self.MAX_POPULATION),
+                                      np.where(hit, np.maximum(population - 1, 0), population))
+
+            changed = np.zeros_like(zones)
+            changed[zones] = new_population != population
+            if changed.any():
+                chunk.population[zones] = new_population
+                grid.record_chunk_changes(CHANGE_POPULATION, chunk, changed)
+            yield
 
 
 class DemandSystem:
@@ -93,28 +81,16 @@ class DemandSystem:
     
     def update(self, grid):
         """Recalculate demand based on current city state."""
-        # Count total population by zone type
-        r_pop = 0  # Residential population (workers/consumers)
-        c_pop = 0  # Commercial population (jobs/services)
-        i_pop = 0  # Industrial population (jobs/goods)
+        # Running totals kept by the grid, no map scan needed
+        stats = grid.stats
+        r_pop = stats.population(RESIDENTIAL)  # Residential population (workers/consumers)
+        c_pop = stats.population(COMMERCIAL)   # Commercial population (jobs/services)
+        i_pop = stats.population(INDUSTRIAL)   # Industrial population (jobs/goods)
         
         # Count zones
-        r_zones = 0
-        c_zones = 0
-        i_zones = 0
-        
-        for x in range(grid.width):
-            for y in range(grid.height):
-                tile = grid.tiles[x][y]
-                if tile.type == 'residential':
-                    r_pop += tile.population
-                    r_zones += 1
-                elif tile.type == 'commercial':
-                    c_pop += tile.population
-                    c_zones += 1
-                elif tile.type == 'industrial':
-                    i_pop += tile.population
-                    i_zones += 1
+        r_zones = stats.tile_count(RESIDENTIAL)
+        c_zones = stats.tile_count(COMMERCIAL)
+        i_zones = stats.tile_count(INDUSTRIAL)
         
         # Calculate demand based on balance
         # Residential demand: driven by available jobs (C + I)
@@ -0,0 +1,92 @@
+"""
+Background simulation thread for SimCity Clone.
+
+Runs player commands and simulation ticks on a worker thread so input and
+drawing stay responsive while a heavy tick runs. The worker owns the live
+grid; the main thread draws from `front`, a read-only snapshot that is
+swapped in after every batch of commands and every tick. Most of a tick is
+NumPy work, which releases the GIL while it runs.
+"""
+
+import threading
+from collections import deque
+
+MAX_BACKLOG = 3  # Most ticks requested ahead of the worker
+
+
+class SimulationWorker:
+    """
+    Applies queued commands and runs ticks for a Simulation on a background thread.
+
+    While the worker is busy it holds `lock`; hold it yourself (e.g. to
+    save or load) to keep the worker out of the simulation state.
+    """
+
+    def __init__(self, simulation):
+        self.simulation = simulation
+        self.lock = threading.RLock()
+        self.commands = deque()  # Player commands waiting for the worker
+        self.ticks_requested = 0
+        self.requests_lock = threading.Lock()  # Guards ticks_requested only, never held for long
+        self.unlimited = False  # Run ticks back to back instead of on request
+        self.wake = threading.Event()
+        self.running = False
+        self.thread = None
+        self.front = simulation.grid.snapshot()
+
+    def start(self):
+        self.running = True
+        self.thread = threading.Thread(target=self._run, name='simulation', daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        """Stop the worker after the batch it is working on."""
+        self.running = False
+        self.wake.set()
+        if self.thread is not None:
+            self.thread.join()
+            self.thread = None
+
+    def submit(self, command):
+        """Queue a player command; the worker applies it before the next tick."""
+        self.commands.append(command)
+        self.wake.set()
+
+    def request_ticks(self, count=1):
+        """
+        Ask for `count` more simulation ticks.
+
+        At most MAX_BACKLOG ticks are kept waiting; requests made while a
+        slow tick is still running beyond that are dropped, so the
+        simulation slows down rather than building up a backlog.
+        """
+        with self.requests_lock:
+            self.ticks_requested = min(self.ticks_requested + count, MAX_BACKLOG)
+        self.wake.set()
+
+    def set_unlimited(self, unlimited):
+        """Run ticks back to back, as fast as the worker can, until turned off."""
+        self.unlimited = unlimited
+        self.wake.set()
+
+    def publish(self):
+        """Swap in a fresh snapshot of the simulation's grid as the front buffer."""
+        self.front = self.simulation.grid.snapshot(self.front)
+
+    def _run(self):
+        while self.running:
+            if not self.unlimited:
+                self.wake.wait()
+                self.wake.clear()
+            with self.lock:
+                while self.commands:
+                    self.simulation.apply_command(self.commands.popleft())
+                # Commands queued during a tick are applied before the next one
+                with self.requests_lock:
+                    run_tick = self.unlimited or self.ticks_requested > 0
+                    self.ticks_requested = max(0, self.ticks_requested - 1)
+                if run_tick:
+                    self.simulation.run_tick()
+                    if self.ticks_requested:
+                        self.wake.set()
+                self.publish()
@@ -1,5 +1,17 @@
+import argparse
+
 from engine.game import Game
 
 if __name__ == "__main__":
-    game = Game()
+    parser = argparse.ArgumentParser(description="SimCity Clone")
+    parser.add_argument('--threaded', action='store_true',
+                        help="run the simulation on a background thread")
+    parser.add_argument('--processes', type=int, default=None,
+                        help="worker processes for crime and land value on huge maps")
+    parser.add_argument('--seed', type=int, default=None,
+                        help="seed for growth and fires")
+    parser.add_argument('--record', metavar='LOG',
+                        help="log this session's commands to LOG on exit, for simulate.py --replay")
+    args = parser.parse_args()
+    game = Game(seed=args.seed, threaded=args.threaded, processes=args.processes, record=args.record)
     game.run()
@@ -0,0 +1,74 @@
+"""
+Run a saved city headless: load a save, run ticks as fast as possible and
+write the resulting city and its stats. Does not need pygame or a display.
+
+    python simulate.py saves/city.json --ticks 1000 --output saves/later.json
+
+With --replay, rerun a session recorded with main.py --record instead and
+check that it ends in the same state as when it was recorded:
+
+    python simulate.py --replay saves/session.json
+"""
+
+import argparse
+import json
+import sys
+import time
+
+from engine.command_log import CommandLog
+from engine.simulation import Simulation
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run a SimCity Clone save without a window")
+    parser.add_argument('save', nargs='?', help="save file to start from")
+    parser.add_argument('--ticks', type=int, default=100, help="number of ticks to run")
+    parser.add_argument('--seed', type=int, default=None, help="seed for growth and fires")
+    parser.add_argument('--replay', metavar='LOG', help="replay a recorded session instead of a save")
+    parser.add_argument('--processes', type=int, default=None,
+                        help="worker processes for crime and land value on huge maps")
+    parser.add_argument('--output', '-o', help="write the resulting city to this save file")
+    parser.add_argument('--stats', help="write stats JSON here instead of to stdout")
+    args = parser.parse_args()
+    if (args.save is None) == (args.replay is None):
+        parser.error("give either a save file or --replay LOG")
+
+    if args.replay:
+        log = CommandLog.load(args.replay)
+        simulation = Simulation.from_log(log, args.processes)
+        start = time.perf_counter()
+        simulation.replay(log)
+        # Before --output: saving finishes a tick the recording stopped in
+        matches = simulation.state_hash() == log.final_hash
+    else:
+        simulation = Simulation.from_file(args.save, args.seed, args.processes)
+        start = time.perf_counter()
+        for _ in range(args.ticks):
+            simulation.run_tick()
+            simulation.collapses.clear()
+    seconds = time.perf_counter() - start
+    simulation.close()
+
+    if args.output:
+        simulation.save(args.output)
+
+    ticks = simulation.tick
+    stats = {
+        'ticks': ticks,
+        'seconds': round(seconds, 3),
+        'ticks_per_second': round(ticks / seconds, 2) if seconds > 0 else None,
+        'system_ms': {name: round(ms, 1) for name, ms in simulation.scheduler.totals.items()},
+        'city': simulation.summary(),
+    }
+    if args.replay:
+        stats['replay'] = {
+            'commands': len(log.commands),
+            'matches': matches,
+        }
+    if args.stats:
+        with open(args.stats, 'w') as f:
+            json.dump(stats, f, indent=2)
+    else:
+        json.dump(stats, sys.stdout, indent=2)
+        print()
+    if args.replay and not stats['replay']['matches']:
+        sys.exit("replay did not end in the recorded state")